@@ -0,0 +1,54 @@
+"""Compare console logging throughput, in records per second, of rich and plain modes.
+
+Run with:
+```sh
+poetry run python benchmarks/logging_throughput.py [records] 2> /dev/null
+```
+"""
+import io
+import logging
+import sys
+import time
+
+from rich.console import Console
+from rich.logging import RichHandler
+
+from deric import logs
+
+
+def bench(handler: logging.Handler, records: int) -> float:
+    """Get the number of records per second handled by `handler`."""
+    logger = logging.getLogger(f"bench.{id(handler)}")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+
+    start = time.perf_counter()
+    for i in range(records):
+        logger.info("processed item %d of %d", i, records)
+    handler.flush()
+    elapsed = time.perf_counter() - start
+
+    logger.removeHandler(handler)
+    handler.close()
+    return records / elapsed
+
+
+def main():
+    records = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+
+    # rich output to an in-memory terminal, to measure rendering only
+    rich_handler = RichHandler(
+        console=Console(file=io.StringIO(), force_terminal=True, width=120),
+        show_time=False,
+        show_level=True,
+    )
+    rich = bench(rich_handler, records)
+    plain = bench(logs.console_handler(plain=True), records)
+
+    print(f"rich:  {rich:12,.0f} records/s")
+    print(f"plain: {plain:12,.0f} records/s ({plain / rich:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
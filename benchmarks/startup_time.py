@@ -0,0 +1,84 @@
+"""Compare cold and warm start times with the startup cache.
+
+Each start runs in a new interpreter, with an app made of many subcommands with many
+arguments. Run with:
+```sh
+poetry run python benchmarks/startup_time.py [subcommands] [arguments] [repeats]
+```
+"""
+import os
+import subprocess
+import sys
+import tempfile
+
+APP = """
+import time
+
+start = time.perf_counter()
+
+from deric import Command, arg
+
+
+def make_command(i):
+    class Sub(Command):
+        name = f"sub{{i}}"
+        description = f"Subcommand {{i}}"
+
+        Config = {{f"arg_{{j}}": arg(int, j, f"argument {{j}}") for j in range({arguments})}}
+
+        def run(self, config):
+            pass
+
+    Sub.__qualname__ = Sub.name
+    return Sub
+
+
+class App(Command):
+    name = "app"
+    description = "Benchmark app"
+    startup_cache = {startup_cache}
+
+    subcommands = [make_command(i) for i in range({subcommands})]
+
+    def run(self, config):
+        pass
+
+
+defined = time.perf_counter()
+App.invoke(["sub0", "--arg-1", "3"], env={{"XDG_CACHE_HOME": {cache_home!r}}})
+print(defined - start, time.perf_counter() - defined)
+"""
+
+
+def start_time(script: str) -> tuple[float, float]:
+    """Get time to import and define the app, and time to invoke it."""
+    out = subprocess.run([sys.executable, script], check=True, capture_output=True, text=True)
+    define, invoke = out.stdout.split()
+    return float(define), float(invoke)
+
+
+def main():
+    subcommands = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    arguments = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    repeats = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for startup_cache in (False, True):
+            script = os.path.join(tmp, f"app_{startup_cache}.py")
+            with open(script, "w") as file:
+                file.write(
+                    APP.format(
+                        subcommands=subcommands,
+                        arguments=arguments,
+                        startup_cache=startup_cache,
+                        cache_home=os.path.join(tmp, "cache"),
+                    ),
+                )
+            cold = start_time(script)[1]
+            warm = min(start_time(script)[1] for _ in range(repeats))
+            label = "with cache:   " if startup_cache else "without cache:"
+            print(f"{label} cold {cold * 1000:8.2f}ms, warm {warm * 1000:8.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
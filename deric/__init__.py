@@ -10,41 +10,97 @@ all of our requirements.
 from __future__ import annotations
 import abc
 import argparse
-from collections.abc import Iterable
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator, Mapping, Sequence
+from contextlib import ExitStack, nullcontext
+from functools import cached_property
 import logging
+import os
+import pickle
+import re
+import time
 from types import SimpleNamespace
-from typing import Any, Tuple, Type
+from typing import Any, NamedTuple, Tuple, Type
 from copy import deepcopy
+import inspect
 from pydantic.fields import FieldInfo
 from pydantic_core import PydanticUndefined
 
-from tomlkit import parse
 from pydantic import ConfigDict, Field, create_model
 
+from deric.arguments import (
+    ArgumentParser,
+    ArgumentParserError,
+    CollectionAction,
+    collection_item_type,
+    exit_on_error,
+)
+from deric.cache import ResultCache, default_cache_dir, fingerprint, fingerprint_object
+from deric.config_export import ConfigExport
+from deric.config_files import load_config_files
 from deric.logs import setup_logging
+from deric.metrics import MetricsRegistry, MetricsWriter
+from deric.parallel import WorkerStats, parallel_map
+from deric.progress import Progress
+from deric.stages import collect_stages, run_stages
+from deric.startup_cache import entry_name, fingerprint_commands, load_parser, store_parser
+from deric.streams import ThreadedStream, TimedIterator, is_stream, iter_async
+from deric.watchdog import Watchdog
+from deric.stages import stage as stage
 
 
 class RuntimeConfig(SimpleNamespace):
     """Runtime configuration."""
 
     def to_dict(self):
-        """Recursively convert to dict."""
-        d = {}
-        for k, v in vars(self).items():
-            if isinstance(v, RuntimeConfig):
-                d[k] = v.to_dict()
-            else:
-                d[k] = v
+        """Convert to dict, including nested namespaces (values are not copied)."""
+        d: dict[str, Any] = {}
+        stack = [(self, d)]
+        while stack:
+            namespace, out = stack.pop()
+            for k, v in vars(namespace).items():
+                if isinstance(v, RuntimeConfig):
+                    out[k] = {}
+                    stack.append((v, out[k]))
+                else:
+                    out[k] = v
         return d
 
 
-def make_namespace(d: Any):
-    """Recursively convert dict to namespace."""
-    if isinstance(d, dict):
-        return RuntimeConfig(**{k: make_namespace(v) for k, v in d.items()})
+def _deep_update(d: dict, other: dict) -> dict:
+    """Get a copy of `d` recursively updated with `other`, without sharing dicts of `other`."""
+    d = dict(d)
+    for k, v in other.items():
+        if isinstance(v, dict):
+            d[k] = _deep_update(d[k] if isinstance(d.get(k), dict) else {}, v)
+        else:
+            d[k] = v
     return d
 
 
+def make_namespace(d: Any):
+    """Convert dict to namespace, including nested dicts."""
+    if not isinstance(d, dict):
+        return d
+    namespace = RuntimeConfig()
+    stack = [(d, namespace)]
+    while stack:
+        d, out = stack.pop()
+        for k, v in d.items():
+            if isinstance(v, dict):
+                child = RuntimeConfig()
+                stack.append((v, child))
+                v = child
+            setattr(out, k, v)
+    return namespace
+
+
+class Invocation(NamedTuple):
+    """Result of `Command.invoke`."""
+
+    config: RuntimeConfig
+    results: list[Any]
+
+
 def add_missing_fields(
     model_def: dict,
     field: str,
@@ -58,14 +114,28 @@ def add_missing_fields(
     return model_def
 
 
+def _takes_upstream(command: Command) -> bool:
+    """Check if `run` of `command` receives the result of the previous command."""
+    return len(inspect.signature(command.run).parameters) > 1
+
+
+def _run_stages(self, config):
+    """Run the stages of the command."""
+    return self.run_stages(config)
+
+
 class _CommandMeta(abc.ABCMeta):
     """Metaclass for Command classes.
 
-    Used to automatically set parents of a subcommand
+    Used to automatically set parents of a subcommand and to collect stages (commands
+    declaring stages don't need to define `run`).
     """
 
     def __new__(cls, name, bases, dct):
+        if "run" not in dct and any(hasattr(v, "_stage_after") for v in dct.values()):
+            dct["run"] = _run_stages
         x = super().__new__(cls, name, bases, dct)
+        x._stages = collect_stages(x)
         x.set_parent(None)
         return x
 
@@ -84,6 +154,51 @@ class Command(metaclass=_CommandMeta):
     # FIXME "forbid" breaks subcommands
     extra = "allow"  # whether to allow extra pydantic fields or not (only from config file)
 
+    metrics: MetricsRegistry
+    metrics_interval: float = 15  # seconds between writes of `metrics_file`, if configured
+
+    # Opt-in caching of `run` results, keyed by the command config section (without
+    # subcommands) and `cache_version`. Disabled for a single run with `--no-cache`.
+    cache_results = False
+    cache_version: str | None = None
+    cache_dir: str | None = None  # defaults to $XDG_CACHE_HOME/deric/results
+    cache_max_bytes = 1 << 30
+    # fields left out of the cache key, they don't change results (e.g. a log file per run)
+    cache_ignore_fields = frozenset(
+        {
+            "log_file",
+            "log_plain",
+            "config_file",
+            "metrics_file",
+            "watchdog_threshold",
+            "workers",
+            "chunk_size",
+        },
+    )
+
+    # Opt-in cache of the parser under $XDG_CACHE_HOME/deric/startup, to skip building
+    # it from commands definitions at each start
+    startup_cache = False
+
+    # When `run` returns an iterator or async iterator, its items are streamed to the
+    # next command. With `stream_thread` they're produced on a separate thread, with up
+    # to `stream_buffer_size` items buffered. The watchdog and run time of the producer
+    # extend to the production of items, streams are closed when consumed.
+    stream_thread = False
+    stream_buffer_size = 1024
+
+    # Opt-in reading of arguments from `{NAME}_{ARG}` environment variables, see
+    # `env_var`. `invoke` reads them from its `env` argument, when given.
+    env_args = False
+
+    # seconds between stack samples of the watchdog, enabled by `watchdog_threshold`
+    watchdog_interval: float = 0.05
+
+    # Stages declared with `@stage`, run concurrently by a "thread" or "process" pool
+    _stages: dict[str, tuple[str, ...]]
+    stage_executor = "thread"
+    max_stage_workers: int | None = None
+
     @classmethod
     def set_parent(cls, parent):
         """Recursively set parent commands."""
@@ -97,15 +212,44 @@ class Command(metaclass=_CommandMeta):
         kls = deepcopy(cls)
 
         # allow with no explicit Config
-        config = cls.Config if hasattr(cls, "Config") else {}
+        config = cls._fields()
 
-        kls.Config = add_missing_fields(
+        config = add_missing_fields(
             deepcopy(config),
             "log_file",
             str,
             default,
             "Path of run log",
         )
+        kls.Config = add_missing_fields(
+            config,
+            "log_plain",
+            bool,
+            default=False,
+            description="Plain console logging, also on interactive terminals",
+        )
+        return kls
+
+    @classmethod
+    def _with_workers(cls, workers=0, chunk_size=0) -> Type[Command]:
+        """Get a subclass with the config fields used by `parallel_map`."""
+        config = deepcopy(cls._fields())
+        add_missing_fields(
+            config, "workers", int, workers, "Number of worker processes, 0 for one per CPU",
+        )
+        add_missing_fields(
+            config,
+            "chunk_size",
+            int,
+            chunk_size,
+            "Items sent to workers at once, 0 to adapt it to their duration",
+        )
+        kls = type(cls)(
+            cls.__name__,
+            (cls,),
+            {"Config": config, "__module__": cls.__module__, "__qualname__": cls.__qualname__},
+        )
+        kls.set_parent(cls.parent)
         return kls
 
     # "config_file", str, "config.toml", "Config file to use"
@@ -113,61 +257,233 @@ class Command(metaclass=_CommandMeta):
     def __init__(self) -> None:
         """Parse and validate settings on object instantiation.
 
+        Arguments are read from `sys.argv`, and from environment variables in
+        `os.environ` if `env_args` is set.
         `Command` configs are validated using Pydantic and `config` attribute is set
         with a `RuntimeConfig` generated from it.
         """
-        # add missing fields if not specified by user. Methods using these are
-        # classmethods so this must be done on the class and not the instance.
-        if not hasattr(self.__class__, "Config"):
-            self.__class__.Config = {}
-
         super().__init__()
         if self.parent:
             return
 
-        parser = self._populate_subcommands()
+        args = self._parse_args(None)
+        self._configure(args, env=os.environ, env_args=self.env_args)
 
-        args = parser.parse_args()
-        config = vars(args)
-
-        # Good-looking logging to console and file
+        # Good-looking logging to console and file, plain if not on a terminal or if
+        # `log_plain` is set (as argument or in the config file).
         # TODO how to handle config_file and log_file if not specified in the Command subclass config?
-        if "log_file" in config:
-            setup_logging(config["log_file"])
-        else:
-            setup_logging(None)
+        setup_logging(
+            getattr(self.config, "log_file", None),
+            plain=getattr(self.config, "log_plain", False) or None,
+        )
+        self._write_effective_config()
 
-        if "config_file" in config:
-            path = config["config_file"]
-            with open(path, "r") as file:
-                tomlconfig = parse(file.read())
-                file_config = dict(tomlconfig)
+        try:
+            # update logging configuration after having read the config file
+            logging.getLogger().setLevel(self.config.logging.loglevel)
+        except AttributeError:
+            pass
+
+    @classmethod
+    def invoke(
+        cls,
+        argv: Sequence[str] = (),
+        *,
+        env: Mapping[str, str] | None = None,
+        config: dict | None = None,
+    ) -> Invocation:
+        """Parse, validate and run the command without touching global state.
+
+        Unlike instantiating the command, `sys.argv` and `os.environ` are not read and
+        logging is not configured: arguments are taken from `argv`, environment
+        variables from `env` (if given) and `config` is used as the content of a config file (it
+        takes precedence over `config_file`, if any). The parser and the models are
+        built once and reused, so this is safe to call concurrently. Invalid arguments
+        raise `ArgumentParserError` (a `ValueError`) instead of exiting.
+        """
+        if cls.parent:
+            raise RuntimeError("Invoke main command instead")
+        command = cls.__new__(cls)
+        command._configure(
+            command._parse_args(list(argv), env or {}),
+            env=env or {},
+            env_args=env is not None,
+            extra_config=config,
+        )
+        results = command.start()
+        return Invocation(command.config, results)
+
+    @classmethod
+    def _fields(cls) -> dict[str, tuple[type, Any]]:
+        """Get config fields (commands can have no explicit Config)."""
+        return getattr(cls, "Config", {})
+
+    @classmethod
+    def _config_model(cls):
+        """Get the pydantic model of the config, created once as long as Config doesn't change."""
+        snapshot = (tuple(cls._fields().items()), cls.extra)
+        cached = cls.__dict__.get("_config_model_cache")
+        if cached is not None and cached[0] == snapshot:
+            return cached[1]
+        config_model = create_model(
+            "config", **cls._fields(), __config__=ConfigDict(extra=cls.extra),
+        )
+        cls._config_model_cache = (snapshot, config_model)
+        return config_model
+
+    @classmethod
+    def _tree_snapshot(cls) -> tuple:
+        """Get what the parser of the command tree depends on."""
+        return (
+            cls,
+            tuple(cls._fields().items()),
+            cls.cache_results,
+            tuple(cmd._tree_snapshot() for cmd in cls.subcommands),
+        )
+
+    @classmethod
+    def _parser(
+        cls, env: Mapping[str, str] = os.environ,
+    ) -> tuple[argparse.ArgumentParser, dict[str, Any]]:
+        """Get the parser, created once as long as the tree of commands doesn't change.
+
+        With `startup_cache` the parser is also restored from disk if the commands
+        didn't change since the last run.
+        Defaults of all the destinations, including subcommand ones, are also returned.
+        """
+        snapshot = cls._tree_snapshot()
+        cached = cls.__dict__.get("_parser_cache")
+        if cached is not None and cached[0] == snapshot:
+            return cached[1], cached[2]
+
+        parser = cls._load_or_build_parser(env) if cls.startup_cache else None
+        if parser is None:
+            parser = cls._populate_subcommands()
+
+        defaults = {}
+        parsers = [parser]
+        for p in parsers:
+            for action in p._actions:
+                if isinstance(action, argparse._SubParsersAction):
+                    parsers.extend(action.choices.values())
+                elif action.dest != argparse.SUPPRESS:
+                    defaults[action.dest] = action.default
+        cls._parser_cache = (snapshot, parser, defaults)
+        return parser, defaults
+
+    @classmethod
+    def _load_or_build_parser(cls, env: Mapping[str, str]) -> argparse.ArgumentParser | None:
+        """Load the parser from the startup cache, or build and store it.
+
+        Return None if the commands can't be fingerprinted.
+        """
+        try:
+            key = fingerprint_commands(cls)
+        except (TypeError, OSError):
+            logging.debug("Can't use startup cache for %s", cls.name)
+            return None
+        directory = os.path.join(default_cache_dir(env), "startup")
+        name = entry_name(cls)
+        parser = load_parser(directory, name, key)
+        if parser is None:
+            parser = cls._populate_subcommands()
+            store_parser(directory, name, key, parser)
+        return parser
+
+    @classmethod
+    def _parse_args(
+        cls, argv: list[str] | None, env: Mapping[str, str] = os.environ,
+    ) -> dict[str, Any]:
+        """Parse `argv` and return a dict of arguments.
+
+        Raise `ArgumentParserError` on invalid arguments, unless parsing `sys.argv`
+        (`argv` is None): then usage and error are printed and the process exits.
+        """
+        parser, _ = cls._parser(env)
+        try:
+            namespace = parser.parse_args(argv)
+        except ArgumentParserError as e:
+            if argv is not None:
+                raise
+            exit_on_error(e)
+        return vars(namespace)
+
+    @classmethod
+    def env_var(cls, dest: str) -> str:
+        """Get the name of the environment variable for an argument destination.
+
+        It's the command name followed by the argument name (prefixed by subcommand
+        names), e.g. `APP_VALUE` or `APP_SUBCOMMAND_VALUE`.
+        """
+        dest = dest.removeprefix(f"{cls.name}_")
+        return re.sub(r"[^A-Z0-9]", "_", f"{cls.name}_{dest}".upper())
+
+    def _configure(
+        self,
+        args: dict[str, Any],
+        *,
+        env: Mapping[str, str],
+        env_args: bool = False,
+        extra_config: dict | None = None,
+    ):
+        """Merge arguments, environment variables and config file(s), then validate.
+
+        Precedence is: arguments, environment variables (only if `env_args`),
+        `extra_config`, config file.
+        """
+        self.env = env
+        config = args
+        _, parser_defaults = self._parser(env)
+
+        # environment variables override values not given as arguments
+        for dest, default in parser_defaults.items() if env_args else ():
+            name = self.env_var(dest)
+            if name in env and dest in config and config[dest] == default:
+                config[dest] = env[name]
+
+        if "config_file" in config or extra_config:
+            # a single file, a directory of fragments or a glob pattern
+            path = config.get("config_file")
+            file_config = load_config_files(path) if path is not None else {}
+            if extra_config:
+                file_config = _deep_update(file_config, extra_config)
 
             # Update config with values from cli (they should take precedence over config files).
             defaults = self.default_config().to_dict()
             args_config = {
                 k: v
-                for k, v in vars(args).items()
+                for k, v in args.items()
                 if v is not None
                 and k != "config_file"
-                and (k not in defaults or v != defaults[k])
+                and (k not in parser_defaults or v != parser_defaults[k])
                 and v != PydanticUndefined
                 # FIXME the special handling of "config_file" is really ugly
             }
             defaults.update(file_config)
             defaults.update(args_config)
             config = defaults
-            config["config_file"] = path
+            if path is not None:
+                config["config_file"] = path
+
+        self.use_cache = not config.pop("no_cache", False)
 
         self._subcmd_to_run: list[Command] = [self]
         validated_config = self.validate_config(config, self._subcmd_to_run)
         self.config: RuntimeConfig = make_namespace(validated_config)
 
-        try:
-            # update logging configuration after having read the config file
-            logging.getLogger().setLevel(self.config.logging.loglevel)
-        except AttributeError:
-            pass
+        # config and metrics are shared by the whole chain of commands
+        self.metrics = MetricsRegistry()
+        for command in self._subcmd_to_run[1:]:
+            command.config = self.config
+            command.metrics = self.metrics
+
+    @classmethod
+    def _ancestors(cls) -> list[Type[Command]]:
+        """Get the command and its parents, up to the main command."""
+        commands = [cls]
+        while commands[-1].parent:
+            commands.append(commands[-1].parent)
+        return commands
 
     @classmethod
     def is_subcommand(cls):
@@ -176,7 +492,30 @@ class Command(metaclass=_CommandMeta):
 
     @abc.abstractmethod
     def run(self, config: RuntimeConfig):
-        """Run for the command."""
+        """Run for the command.
+
+        If `run` takes a second argument, it gets the value returned by the `run` of
+        the previous command in the chain.
+        """
+
+    def run_stages(self, config: RuntimeConfig) -> dict[str, Any]:
+        """Run the stages of the command, following their dependencies.
+
+        Independent stages are run concurrently, the first failing one stops the run.
+        Results of all the stages are returned by name.
+        """
+        return run_stages(
+            self,
+            config,
+            self._stages,
+            executor=self.stage_executor,
+            max_workers=self.max_stage_workers,
+        )
+
+    @classmethod
+    def _uses_cache(cls) -> bool:
+        """Check if this command or any of its subcommands caches results."""
+        return cls.cache_results or any(cmd._uses_cache() for cmd in cls.subcommands)
 
     @classmethod
     def default_config(
@@ -206,9 +545,7 @@ class Command(metaclass=_CommandMeta):
             k.removeprefix(prefix): v for k, v in kwargs.items() if k.startswith(prefix)
         }
 
-        config_model = create_model(
-            "config", **cls.Config, __config__=ConfigDict(extra=cls.extra),
-        )
+        config_model = cls._config_model()
         if validate:
             config_model_instance = config_model(**relevant)
         else:
@@ -241,9 +578,6 @@ class Command(metaclass=_CommandMeta):
             parser: parser to use (means we're in a subparser)
         """
         # Add Pydantic model to an ArgumentParser
-        if not hasattr(cls, "Config"):
-            cls.Config = {}
-
         def parser_args(name: str, ftype: type, field: FieldInfo) -> tuple[list, dict]:
             return (
                 [
@@ -256,14 +590,14 @@ class Command(metaclass=_CommandMeta):
                     if cls.name == parser.prog
                     else f"{prefix}{cls.name}_{name}",
                     "type": ftype if ftype in (int, float, str) else str,
-                    "action": "append" if ftype in (set[str], list[str]) else "store",
+                    "action": "store",
                     "default": field.default,
                     "help": field.description,
                 },
             )
 
         # Turn the fields of the model as arguments of the parser
-        for name, (ftype, field) in cls.Config.items():
+        for name, (ftype, field) in cls._fields().items():
             # ignore fields not marked to be ignored in cli
             if (
                 field.json_schema_extra
@@ -279,6 +613,12 @@ class Command(metaclass=_CommandMeta):
                 kwargs.pop("type")  # no type when using `store_true`
                 kwargs["action"] = "store_true"
 
+            # collections can be repeated and read from files or stdin
+            is_collection, item_type, split = collection_item_type(ftype)
+            if is_collection:
+                kwargs.pop("type")  # items are converted by the action
+                kwargs.update(action=CollectionAction, item_type=item_type, split=split)
+
             parser.add_argument(
                 *args,
                 **kwargs,
@@ -289,7 +629,7 @@ class Command(metaclass=_CommandMeta):
     def _populate_subcommands(cls, parser: argparse.ArgumentParser | None = None):
         """Add subcommands and relative arguments to argparse parser."""
         parser = (
-            argparse.ArgumentParser(
+            ArgumentParser(
                 prog=cls.name,
                 description=cls.description,
                 # epilog=cls.epilog,
@@ -300,6 +640,14 @@ class Command(metaclass=_CommandMeta):
 
         cls._populate_arguments(parser=parser)
 
+        if not cls.parent and cls._uses_cache():
+            parser.add_argument(
+                "--no-cache",
+                dest="no_cache",
+                action="store_true",
+                help="ignore and don't store cached results",
+            )
+
         if not cls.subcommands:
             return parser
 
@@ -331,9 +679,7 @@ class Command(metaclass=_CommandMeta):
 
         Command configs are validated using Pydantic and a dict is returned.
         """
-        config_model = create_model(
-            "config", **cls.Config, __config__=ConfigDict(extra=cls.extra),
-        )
+        config_model = cls._config_model()
         config_model_instance = config_model(**relevant)
         config = config_model_instance.model_dump()
 
@@ -377,17 +723,224 @@ class Command(metaclass=_CommandMeta):
                     config[cmd.name] = cmd_config
         return config
 
+    def progress(self, description: str, total: int | None = None, **kwargs) -> Progress:
+        """Get a `Progress` to report progress of the command from inside `run`.
+
+        Increments are cheap enough for hot loops, rendering is done at a fixed rate
+        on a background thread. Like console logs, it's plain if `log_plain` is set.
+        """
+        kwargs.setdefault("plain", getattr(self.config, "log_plain", False) or None)
+        return Progress(description, total, **kwargs)
+
+    @cached_property
+    def effective_config(self) -> ConfigExport:
+        """Effective config of the run, exported to TOML and JSON and hashed on first use."""
+        return ConfigExport(self.config)
+
+    def _write_effective_config(self):
+        """Write the effective config next to `log_file`, if any, and log its hash."""
+        log_file = getattr(self.config, "log_file", None)
+        if not log_file:
+            return
+        toml_path, json_path = self.effective_config.write(
+            f"{os.path.splitext(log_file)[0]}.config",
+        )
+        logging.info(
+            "Effective config %s written to %s and %s",
+            self.effective_config.digest,
+            toml_path,
+            json_path,
+        )
+
+    def parallel_map(
+        self,
+        fn: Callable[[RuntimeConfig, Any], Any],
+        items: Iterable,
+        *,
+        ordered: bool = True,
+        stats: dict[int, WorkerStats] | None = None,
+    ) -> Iterator:
+        """Yield `fn(config, item)` for each of `items`, computed by worker processes.
+
+        The number of workers and the chunk size are read from the `workers` and
+        `chunk_size` fields of the command config, or of the main command one, see
+        `_with_workers`. `fn` must be defined at module level. See
+        `deric.parallel.parallel_map`.
+        """
+        section = self.config
+        for command in reversed(self._ancestors()[:-1]):
+            section = getattr(section, command.name)
+        return parallel_map(
+            fn,
+            items,
+            self.config,
+            workers=getattr(section, "workers", None) or getattr(self.config, "workers", None),
+            chunk_size=getattr(section, "chunk_size", None)
+            or getattr(self.config, "chunk_size", None),
+            ordered=ordered,
+            stats=stats,
+        )
+
     def start(self):
         """Call `cmd.run()` for each subcommand.
 
-        Should always be called on main command
+        Should always be called on main command. Commands can record metrics with
+        `self.metrics`, written to `metrics_file` if it's in the config. Commands
+        running longer than `watchdog_threshold` seconds, if in the config, get their
+        stacks sampled.
+        Values returned by each `run` are returned.
         """
         if self.parent:
             raise RuntimeError("Run main command instead")
 
-        for command in self._subcmd_to_run:
+        # metrics are written periodically and at exit if `metrics_file` is configured
+        metrics_file = getattr(self.config, "metrics_file", None)
+        writer = (
+            MetricsWriter(self.metrics, metrics_file, self.metrics_interval)
+            if metrics_file
+            else nullcontext()
+        )
+        results: list[Any] = []
+        # commands streaming their result to the next one, finished when the chain of
+        # streams has been consumed
+        streaming: list[tuple[Command, ExitStack, float, TimedIterator, Iterator]] = []
+        with writer:
+            try:
+                for i, command in enumerate(self._subcmd_to_run):
+                    stack = ExitStack()
+                    stack.enter_context(self._watchdog(command))
+                    start = time.perf_counter()
+                    try:
+                        result = self._run_command(i, results[-1] if results else None)
+                    except BaseException:
+                        stack.close()
+                        raise
+                    elapsed = time.perf_counter() - start
+
+                    if self._streams_to_next(i, result):
+                        # the producer runs while the next command consumes its items
+                        timed = TimedIterator(
+                            iter_async(result) if isinstance(result, AsyncIterator) else result,
+                        )
+                        result = (
+                            ThreadedStream(timed, command.stream_buffer_size)
+                            if command.stream_thread
+                            else timed
+                        )
+                        streaming.append((command, stack, elapsed, timed, result))
+                    else:
+                        stack.close()
+                        self._observe_run(command, elapsed)
+                        self._finish_streams(streaming)
+                    results.append(result)
+            finally:
+                self._finish_streams(streaming)
+        return results
+
+    def _observe_run(self, command: Command, seconds: float):
+        self.metrics.histogram(
+            "deric_command_run_seconds",
+            "Duration of command runs",
+            {"command": command.name},
+        ).observe(seconds)
+
+    def _streams_to_next(self, index: int, result: Any) -> bool:
+        """Check if `result` of the `index`-th command is streamed to the next one."""
+        return (
+            is_stream(result)
+            and index + 1 < len(self._subcmd_to_run)
+            and _takes_upstream(self._subcmd_to_run[index + 1])
+        )
+
+    def _finish_streams(
+        self, streaming: list[tuple[Command, ExitStack, float, TimedIterator, Iterator]],
+    ):
+        """Stop producers and wait for them, stop their watchdogs and record their run time."""
+        for command, stack, elapsed, timed, stream in streaming:
+            stream.close()
+            stack.close()
+            self._observe_run(command, elapsed + timed.seconds)
+        streaming.clear()
+
+    def _watchdog(self, command: Command) -> Watchdog | nullcontext:
+        """Get a watchdog for `command` if `watchdog_threshold` is configured.
+
+        Collapsed stacks are written next to `log_file`, if any.
+        """
+        threshold = getattr(self.config, "watchdog_threshold", None)
+        if not threshold:
+            return nullcontext()
+        log_file = getattr(self.config, "log_file", None)
+        return Watchdog(
+            command.name,
+            threshold,
+            output=f"{os.path.splitext(log_file)[0]}.{command.name}.stacks" if log_file else None,
+            interval=self.watchdog_interval,
+        )
+
+    def _config_section(self, index: int) -> dict:
+        """Get config of the `index`-th command in the chain, for its cache key.
+
+        Subcommands and `cache_ignore_fields` of the command are left out.
+        """
+        section = self.config
+        for command in self._subcmd_to_run[1 : index + 1]:
+            section = getattr(section, command.name)
+        command = self._subcmd_to_run[index]
+        subcommands = {cmd.name for cmd in command.subcommands}
+        # subcommand arguments are also flattened in the parent config
+        prefixes = tuple(
+            p for name in subcommands for p in (f"{name}_", f"{command.name}_{name}_")
+        )
+        return {
+            k: v.to_dict() if isinstance(v, RuntimeConfig) else v
+            for k, v in vars(section).items()
+            if k not in subcommands
+            and k not in command.cache_ignore_fields
+            and k not in ("subcommand", f"{command.name}_subcommand")
+            and not k.startswith(prefixes)
+        }
+
+    def _run_command(self, index: int, upstream: Any) -> Any:
+        """Run the `index`-th command in the chain, or get its cached result."""
+        command = self._subcmd_to_run[index]
+        takes_upstream = _takes_upstream(command)
+        args = (self.config, upstream) if takes_upstream else (self.config,)
+        if not (command.cache_results and self.use_cache):
             logging.info("Running %s", command.name)
-            command.run(self.config)
+            return command.run(*args)
+
+        cache = ResultCache(
+            command.cache_dir or os.path.join(default_cache_dir(self.env), "results"),
+            command.cache_max_bytes,
+        )
+        try:
+            key = fingerprint(
+                f"{type(command).__module__}.{type(command).__qualname__}",
+                command.cache_version,
+                self._config_section(index),
+                # the result depends on the one of the previous command, if it's used
+                fingerprint_object(upstream) if takes_upstream else None,
+            )
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            logging.warning("Can't cache result of %s: %s", command.name, e)
+            logging.info("Running %s", command.name)
+            return command.run(*args)
+
+        try:
+            result = cache.get(key)
+            logging.info("Using cached result for %s", command.name)
+            return result
+        except KeyError:
+            pass
+
+        logging.info("Running %s", command.name)
+        result = command.run(*args)
+        try:
+            cache.put(key, result)
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            logging.warning("Can't cache result of %s: %s", command.name, e)
+        return result
 
 
 def arg(argtype, default, description, **kwargs):
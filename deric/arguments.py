@@ -0,0 +1,146 @@
+"""Argparse support: parser not exiting on errors and collection-valued options.
+
+Options for `list`, `set`, `tuple[..., ...]` and packed list fields can be repeated, and
+each value can be `@path` or `-` to read values from a file or from stdin, one per line
+or NUL-separated. Files are read lazily, when the config is validated. Values starting
+with `@@` stand for a literal `@` followed by the rest, e.g. `@@user` for `@user`; a
+literal `-` can only be read from a file.
+"""
+from __future__ import annotations
+import argparse
+import sys
+from typing import Any, Callable, Iterator, NoReturn, get_args, get_origin
+
+from deric.types.packed import _PackedList
+
+# item types converted while parsing, others are left to pydantic
+_ITEM_TYPES = (int, float, str)
+
+
+class ArgumentParserError(ValueError):
+    """Invalid arguments, reported by `parser`."""
+
+    def __init__(self, parser: argparse.ArgumentParser, message: str) -> None:
+        super().__init__(message)
+        self.parser = parser
+
+
+class ArgumentParser(argparse.ArgumentParser):
+    """Parser raising `ArgumentParserError` on invalid arguments, instead of exiting.
+
+    Subparsers are of the same class. Use `exit_on_error` to report the error and exit
+    as `argparse` does.
+    """
+
+    def error(self, message: str):
+        raise ArgumentParserError(self, message)
+
+
+def exit_on_error(error: ArgumentParserError) -> NoReturn:
+    """Print usage and error message of the failing parser to stderr and exit."""
+    argparse.ArgumentParser.error(error.parser, str(error))
+
+
+def collection_item_type(ftype: Any) -> tuple[bool, Callable | None, bool]:
+    """Check if `ftype` is a collection for the cli.
+
+    Return whether it is, the type to convert items to (if any) and whether values can
+    be comma-separated lists of items.
+    """
+    if isinstance(ftype, type) and issubclass(ftype, _PackedList):
+        return True, ftype.item_type, True
+    origin = get_origin(ftype)
+    args = get_args(ftype)
+    if origin is tuple and not (len(args) == 2 and args[1] is Ellipsis):
+        return False, None, False
+    if origin in (list, set, frozenset, tuple):
+        item_type = args[0] if args and args[0] in _ITEM_TYPES else None
+        return True, item_type, False
+    return False, None, False
+
+
+def iter_file_values(source: str, chunk_size: int = 1 << 16) -> Iterator[str]:
+    """Read values from `@path` or `-` (stdin), one per line or NUL-separated.
+
+    The separator is NUL if there's any in the first chunk read, empty values are
+    skipped.
+    """
+    if source == "-":
+        file = sys.stdin.buffer
+    else:
+        file = open(source[1:], "rb")
+    try:
+        separator = None
+        rest = b""
+        while chunk := file.read(chunk_size):
+            data = rest + chunk
+            if separator is None:
+                separator = b"\0" if b"\0" in data else b"\n"
+            *items, rest = data.split(separator)
+            for item in items:
+                if value := _decode(item, separator):
+                    yield value
+        if value := _decode(rest, separator):
+            yield value
+    finally:
+        if file is not sys.stdin.buffer:
+            file.close()
+
+
+def _decode(item: bytes, separator: bytes | None) -> str:
+    value = item.decode()
+    return value.removesuffix("\r") if separator == b"\n" else value
+
+
+class LazyValues:
+    """Values of a collection option, with files read only when iterating."""
+
+    def __init__(self, sources: list[list | str]) -> None:
+        self.sources = sources
+
+    def __iter__(self) -> Iterator[Any]:
+        for source in self.sources:
+            if isinstance(source, str):
+                yield from iter_file_values(source)
+            else:
+                yield from source
+
+    def __repr__(self) -> str:
+        return f"LazyValues({self.sources!r})"
+
+
+class CollectionAction(argparse.Action):
+    """Append values of a repeatable option, supporting `@path`, `-` (stdin) and `@@` escapes."""
+
+    def __init__(
+        self,
+        option_strings: list[str],
+        dest: str,
+        *,
+        item_type: Callable | None = None,
+        split: bool = False,
+        **kwargs,
+    ) -> None:
+        super().__init__(option_strings, dest, **kwargs)
+        self.item_type = item_type
+        self.split = split
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        current = getattr(namespace, self.dest, None)
+        sources = list(current.sources) if isinstance(current, LazyValues) else []
+
+        if values == "-" or (values.startswith("@") and not values.startswith("@@")):
+            sources.append(values)
+        else:
+            # "@@" escapes a literal "@"
+            if values.startswith("@@"):
+                values = values[1:]
+            items = [x.strip() for x in values.split(",")] if self.split else [values]
+            if self.item_type is not None:
+                try:
+                    items = [self.item_type(x) for x in items if x]
+                except ValueError:
+                    name = self.item_type.__name__
+                    raise argparse.ArgumentError(self, f"invalid {name} value: {values!r}") from None
+            sources.append(items)
+        setattr(namespace, self.dest, LazyValues(sources))
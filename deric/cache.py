@@ -0,0 +1,93 @@
+"""On-disk cache of command results, keyed by a fingerprint of their config."""
+from __future__ import annotations
+import contextlib
+from enum import Enum
+import hashlib
+import json
+import logging
+import os
+import pickle
+from typing import Any, Mapping
+
+from deric.files import write_atomic
+
+
+def default_cache_dir(env: Mapping[str, str] = os.environ) -> str:
+    """Get deric cache directory, following the XDG base directory specification."""
+    base = env.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "deric")
+
+
+def _canonical(value: Any) -> Any:
+    """Convert values json doesn't know about."""
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    return repr(value)
+
+
+def fingerprint(*parts: Any) -> str:
+    """Get a stable hash of json-like `parts`."""
+    data = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=_canonical)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def fingerprint_object(value: Any) -> str:
+    """Get a hash of any picklable `value`."""
+    return hashlib.sha256(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)).hexdigest()
+
+
+class ResultCache:
+    """Directory of pickled results, evicted least recently used first."""
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pickle")
+
+    def get(self, key: str) -> Any:
+        """Get cached result for `key`, raise KeyError if missing or invalid.
+
+        Invalid (e.g. truncated) results are removed.
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                result = pickle.load(file)
+            # mtime marks the last use
+            os.utime(path)
+        except FileNotFoundError:
+            raise KeyError(key) from None
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, IndexError) as e:
+            logging.warning("Removing invalid cached result %s: %s", key, e)
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            raise KeyError(key) from None
+        return result
+
+    def put(self, key: str, value: Any):
+        """Store `value` for `key`, then evict old results if above `max_bytes`."""
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        os.makedirs(self.directory, exist_ok=True)
+        write_atomic(self._path(key), data)
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used results until total size is within `max_bytes`."""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith(".pickle"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            # may have been removed concurrently
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(path)
+            total -= size
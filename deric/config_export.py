@@ -0,0 +1,120 @@
+"""Export of the effective config to TOML and JSON, with a canonical content hash.
+
+Conversion to plain values is iterative, so deep trees don't hit the recursion limit,
+and is done once per `ConfigExport`: serializations and hash are computed on first use
+and cached.
+"""
+from __future__ import annotations
+from array import array
+from enum import Enum
+from functools import cached_property
+import hashlib
+import json
+from types import SimpleNamespace
+from typing import Any, Mapping
+
+import tomlkit
+
+from deric.files import write_atomic
+
+
+def _plain_scalar(value: Any) -> Any:
+    if isinstance(value, Enum):
+        return value.name
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return str(value)
+
+
+def to_plain(value: Any) -> Any:
+    """Convert `value` to json-like values.
+
+    Namespaces and mappings become dicts, sequences and arrays become lists, sets become
+    sorted lists and enums their name. Other values (e.g. paths) are converted with
+    `str`.
+    """
+    root: list[Any] = [None]
+    stack: list[tuple[Any, Any, Any]] = [(value, root, 0)]
+    # lists converted from sets, sorted once their items are converted
+    unsorted: list[list] = []
+    while stack:
+        value, parent, key = stack.pop()
+        if isinstance(value, SimpleNamespace):
+            value = vars(value)
+        if isinstance(value, Mapping):
+            parent[key] = out = {}
+            children = [(v, out, str(k)) for k, v in value.items()]
+            # placeholders to keep keys order
+            out.update(dict.fromkeys(k for _, _, k in children))
+        elif isinstance(value, (list, tuple, array, set, frozenset)):
+            parent[key] = out = [None] * len(value)
+            children = [(v, out, i) for i, v in enumerate(value)]
+            if isinstance(value, (set, frozenset)):
+                unsorted.append(out)
+        else:
+            parent[key] = _plain_scalar(value)
+            continue
+        stack.extend(children)
+
+    # inner sets were found later, sort them first
+    for out in reversed(unsorted):
+        out.sort(key=lambda v: json.dumps(v, sort_keys=True))
+    return root[0]
+
+
+def _without_none(data: Any) -> Any:
+    """Get json-like `data` without `None` values, that TOML can't represent.
+
+    Dicts and lists are rebuilt, other values are shared.
+    """
+    root: list[Any] = [None]
+    stack: list[tuple[Any, Any, Any]] = [(data, root, 0)]
+    while stack:
+        value, parent, key = stack.pop()
+        if isinstance(value, dict):
+            parent[key] = out = {}
+            children = [(v, out, k) for k, v in value.items() if v is not None]
+            out.update(dict.fromkeys(k for _, _, k in children))
+        elif isinstance(value, list):
+            items = [v for v in value if v is not None]
+            parent[key] = out = [None] * len(items)
+            children = [(v, out, i) for i, v in enumerate(items)]
+        else:
+            parent[key] = value
+            continue
+        stack.extend(children)
+    return root[0]
+
+
+class ConfigExport:
+    """Effective config, as plain values, TOML, JSON and content hash."""
+
+    def __init__(self, config: Any) -> None:
+        self.config = config
+
+    @cached_property
+    def data(self) -> dict[str, Any]:
+        """Config as json-like values."""
+        return to_plain(self.config)
+
+    @cached_property
+    def json(self) -> str:
+        """Canonical JSON of the config, with sorted keys and no whitespace."""
+        return json.dumps(self.data, sort_keys=True, separators=(",", ":"))
+
+    @cached_property
+    def toml(self) -> str:
+        """TOML of the config, without `None` values."""
+        return tomlkit.dumps(_without_none(self.data))
+
+    @cached_property
+    def digest(self) -> str:
+        """SHA-256 of the canonical JSON."""
+        return hashlib.sha256(self.json.encode()).hexdigest()
+
+    def write(self, path_stem: str) -> tuple[str, str]:
+        """Atomically write `{path_stem}.toml` and `{path_stem}.json`, return their paths."""
+        paths = (f"{path_stem}.toml", f"{path_stem}.json")
+        for path, content in zip(paths, (self.toml, self.json), strict=True):
+            write_atomic(path, content)
+        return paths
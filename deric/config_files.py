@@ -0,0 +1,106 @@
+"""TOML config files loading.
+
+`config_file` can point to a single file, to a directory (all the `*.toml` files in it
+are used) or to a glob pattern, if no file has that name. Fragments are parsed concurrently and then deep-merged
+in lexicographic path order; a key set to different values by two fragments is an error.
+"""
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor
+import glob
+import os
+import threading
+from typing import Any
+
+from tomlkit import parse
+
+
+# parsed fragments, keyed by path and validated with (mtime, size)
+_parse_cache: dict[str, tuple[tuple[int, int], dict]] = {}
+_parse_cache_lock = threading.Lock()
+
+
+class ConfigConflictError(ValueError):
+    """Raised when two config fragments set the same key to different values."""
+
+
+def resolve_config_files(path: str) -> list[str]:
+    """Get the sorted list of fragments referenced by `path`."""
+    if os.path.isdir(path):
+        pattern = os.path.join(path, "*.toml")
+    elif os.path.isfile(path) or not any(c in path for c in "*?["):
+        # existing files are used as they are, even if named like a pattern
+        return [path]
+    else:
+        pattern = path
+
+    paths = sorted(p for p in glob.glob(pattern) if os.path.isfile(p))
+    if not paths:
+        raise FileNotFoundError(f"No config file matching {pattern}")
+    return paths
+
+
+def parse_config_file(path: str) -> dict:
+    """Parse a single TOML file, reusing the cached result if it didn't change.
+
+    The returned dict is shared with the cache and must not be modified.
+    """
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    with _parse_cache_lock:
+        cached = _parse_cache.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    with open(path, "r") as file:
+        parsed = parse(file.read()).unwrap()
+    with _parse_cache_lock:
+        _parse_cache[path] = (key, parsed)
+    return parsed
+
+
+def merge_config_fragments(fragments: list[tuple[str, dict]]) -> dict:
+    """Deep-merge parsed fragments, in the given order, into a new dict.
+
+    Tables are merged, any other value can be set by a single fragment only (or by
+    more fragments, as long as they agree on it).
+    """
+    merged: dict = {}
+    # where each key (leaf or table) has been first set, to report conflicts
+    origins: dict[tuple[str, ...], str] = {}
+
+    for path, fragment in fragments:
+        # iterative walk, each entry is (destination, source, key prefix)
+        stack: list[tuple[dict, dict, tuple[str, ...]]] = [(merged, fragment, ())]
+        while stack:
+            dst, src, prefix = stack.pop()
+            for k, v in src.items():
+                key = (*prefix, k)
+                if isinstance(v, dict):
+                    if k not in dst:
+                        dst[k] = {}
+                        origins[key] = path
+                    elif not isinstance(dst[k], dict):
+                        raise ConfigConflictError(_conflict_message(key, origins[key], path))
+                    stack.append((dst[k], v, key))
+                elif k in dst:
+                    if isinstance(dst[k], dict) or dst[k] != v:
+                        raise ConfigConflictError(_conflict_message(key, origins[key], path))
+                else:
+                    dst[k] = v
+                    origins[key] = path
+    return merged
+
+
+def _conflict_message(key: tuple[str, ...], first: str, second: str) -> str:
+    return f"Conflicting values for '{'.'.join(key)}' in config files {first} and {second}"
+
+
+def load_config_files(path: str, max_workers: int | None = None) -> dict[str, Any]:
+    """Load config from a file, a directory of fragments or a glob pattern."""
+    paths = resolve_config_files(path)
+    if len(paths) == 1:
+        parsed = [parse_config_file(paths[0])]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            parsed = list(executor.map(parse_config_file, paths))
+    return merge_config_fragments(list(zip(paths, parsed, strict=True)))
@@ -0,0 +1,22 @@
+"""Writing of the files produced by deric (results, metrics, exports, ...)."""
+from __future__ import annotations
+import os
+import tempfile
+
+
+def write_atomic(path: str, data: str | bytes):
+    """Write `data` to `path`, so that readers see either the old or the new content.
+
+    `data` goes to a uniquely named temporary file in the same directory, then replaces
+    `path`: concurrent writers of the same path don't clash, the last one wins. The
+    file is readable by other users (e.g. metrics collectors).
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+    try:
+        os.fchmod(fd, 0o644)
+        with os.fdopen(fd, "wb" if isinstance(data, bytes) else "w") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -1,4 +1,11 @@
+from __future__ import annotations
 import logging
+from logging.handlers import MemoryHandler, QueueHandler
+import multiprocessing
+from multiprocessing import util
+import sys
+import threading
+from typing import Any
 
 from rich.console import Console
 from rich.logging import RichHandler
@@ -7,13 +14,71 @@ from rich.logging import RichHandler
 # rich console to import if needed
 console = Console()
 
+# records buffered by the plain console handler before being written to stderr.
+# Records at `PLAIN_FLUSH_LEVEL` or higher are written immediately, others at least
+# every `PLAIN_FLUSH_INTERVAL` seconds.
+PLAIN_BUFFER_CAPACITY = 512
+PLAIN_FLUSH_LEVEL = logging.WARNING
+PLAIN_FLUSH_INTERVAL = 0.5
 
-def setup_logging(logfile: str | None):
-    """Setup logging, with logfile in data dir and rich console output."""
+
+def is_interactive() -> bool:
+    """Check if console output goes to an interactive terminal."""
+    return console.is_terminal
+
+
+class TimedMemoryHandler(MemoryHandler):
+    """`MemoryHandler` also flushed every `flush_interval` seconds, from a background thread."""
+
+    def __init__(self, capacity: int, flush_interval: float, **kwargs) -> None:
+        super().__init__(capacity, **kwargs)
+        self.flush_interval = flush_interval
+        self._closed = threading.Event()
+        threading.Thread(target=self._flush_periodically, name="log-flush", daemon=True).start()
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        self._closed.set()
+        super().close()
+
+
+def console_handler(*, plain: bool | None = None) -> logging.Handler:
+    """Get the handler for console logging.
+
+    A `RichHandler` is used on interactive terminals, otherwise (or if `plain` is set)
+    records are formatted by the standard formatter and written to stderr in batches,
+    at least every `PLAIN_FLUSH_INTERVAL` seconds.
+    """
+    if plain is None:
+        plain = not is_interactive()
+    if not plain:
+        return RichHandler(show_time=False, show_level=True)
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(
+        logging.Formatter("%(asctime)s %(levelname)-8s %(message)s"),
+    )
+    return TimedMemoryHandler(
+        PLAIN_BUFFER_CAPACITY,
+        PLAIN_FLUSH_INTERVAL,
+        flushLevel=PLAIN_FLUSH_LEVEL,
+        target=stream_handler,
+    )
+
+
+def setup_logging(logfile: str | None, *, plain: bool | None = None):
+    """Setup logging, with logfile in data dir and rich console output.
+
+    Rich output is replaced by plain buffered output to stderr when `plain` is True,
+    or when it's None and the console is not an interactive terminal.
+    """
     # format = "%(asctime)s %(levelname)-1.1s %(message)s"
     format = "%(asctime)s %(message)s"
     handlers: list[logging.Handler] = [
-        RichHandler(show_time=False, show_level=True),
+        console_handler(plain=plain),
     ]
     if logfile:
         handlers.append(logging.FileHandler(logfile))
@@ -24,3 +89,118 @@ def setup_logging(logfile: str | None):
         datefmt="[%X]",
         handlers=handlers,
     )
+
+
+class BatchQueueHandler(QueueHandler):
+    """Handler sending records to a queue in batches, for worker processes.
+
+    A batch is sent when `capacity` records are buffered, on records at `flush_level`
+    or higher and, from a background thread, every `flush_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        queue: Any,
+        capacity: int = 100,
+        flush_interval: float = 0.5,
+        flush_level: int = logging.WARNING,
+    ) -> None:
+        super().__init__(queue)
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.flush_level = flush_level
+        self.buffer: list[logging.LogRecord] = []
+        self._closed = threading.Event()
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.buffer.append(self.prepare(record))
+            if len(self.buffer) >= self.capacity or record.levelno >= self.flush_level:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        with self.lock:
+            if self.buffer:
+                self.queue.put(self.buffer)
+                self.buffer = []
+
+    def _flush_periodically(self):
+        while not self._closed.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        self._closed.set()
+        super().close()
+
+
+def setup_worker_logging(queue: Any, level: int = logging.NOTSET):
+    """Send all logs of the current (worker) process to a `LogListener` queue.
+
+    Meant to be used as initializer of process pools, replacing any handler inherited
+    from the parent process.
+    """
+    handler = BatchQueueHandler(queue)
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    threading.Thread(target=handler._flush_periodically, name="log-flush", daemon=True).start()
+    # multiprocessing workers don't run atexit handlers, but do run these. It must run
+    # before the queue is closed by its own finalizer, with priority 10.
+    util.Finalize(None, handler.flush, exitpriority=20)
+
+
+class LogListener:
+    """Receive logs from worker processes and handle them in this process.
+
+    Records go through the loggers of this process, so they end up in the same
+    console and log file:
+
+        with LogListener() as listener:
+            with ProcessPoolExecutor(**listener.pool_kwargs()) as pool:
+                ...
+    """
+
+    def __init__(self, context: Any = None, level: int = logging.NOTSET) -> None:
+        self.queue = (context or multiprocessing).Queue()
+        self.level = level
+        self._thread = threading.Thread(target=self._run, name="log-listener", daemon=True)
+
+    @property
+    def initializer(self):
+        """Initializer for worker processes."""
+        return setup_worker_logging
+
+    @property
+    def initargs(self) -> tuple:
+        """Arguments of `initializer`."""
+        return (self.queue, self.level)
+
+    def pool_kwargs(self) -> dict[str, Any]:
+        """Keyword arguments for `ProcessPoolExecutor` or `multiprocessing.Pool`."""
+        return {"initializer": self.initializer, "initargs": self.initargs}
+
+    def _run(self):
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                break
+            for record in batch:
+                logger = logging.getLogger(record.name)
+                if logger.isEnabledFor(record.levelno):
+                    logger.handle(record)
+
+    def __enter__(self) -> LogListener:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_):
+        self.queue.put(None)
+        self._thread.join()
+        # stop the feeder thread of the queue
+        self.queue.close()
+        self.queue.join_thread()
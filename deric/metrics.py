@@ -0,0 +1,255 @@
+"""Metrics collection and export in OpenMetrics text format.
+
+Counters and histograms accumulate in per-thread shards, so updates never take a lock;
+shards are merged only when metrics are rendered. The output is meant to be picked up by
+e.g. the node-exporter textfile collector.
+"""
+from __future__ import annotations
+import abc
+from bisect import bisect_left
+import math
+import threading
+from typing import Iterable
+
+from deric.files import write_atomic
+
+
+DEFAULT_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0,
+)
+
+
+class _Metric(abc.ABC):
+    """A single time series."""
+
+    type: str
+
+    def __init__(self, name: str, labels: dict[str, str]) -> None:
+        self.name = name
+        self.labels = labels
+        self._lock = threading.Lock()
+
+    def _label_str(self, extra: str = "") -> str:
+        labels = [f'{k}="{_escape(str(v))}"' for k, v in self.labels.items()]
+        if extra:
+            labels.append(extra)
+        return "{" + ",".join(labels) + "}" if labels else ""
+
+    @abc.abstractmethod
+    def samples(self) -> Iterable[str]:
+        """Get OpenMetrics sample lines."""
+
+
+class _ShardedMetric(_Metric):
+    """Metric with a list of values for each thread updating it."""
+
+    def __init__(self, name: str, labels: dict[str, str]) -> None:
+        super().__init__(name, labels)
+        self._local = threading.local()
+        self._shards: list[list[float]] = []
+
+    def _new_shard(self) -> list[float]:
+        shard = self._empty_shard()
+        self._local.shard = shard
+        with self._lock:
+            self._shards.append(shard)
+        return shard
+
+    @abc.abstractmethod
+    def _empty_shard(self) -> list[float]:
+        """Get a shard with all values set to zero."""
+
+    def _merged(self) -> list[float]:
+        with self._lock:
+            shards = list(self._shards)
+        merged = self._empty_shard()
+        for shard in shards:
+            for i, v in enumerate(shard):
+                merged[i] += v
+        return merged
+
+
+class Counter(_ShardedMetric):
+    """Monotonically increasing counter."""
+
+    type = "counter"
+
+    def _empty_shard(self) -> list[float]:
+        return [0.0]
+
+    def inc(self, amount: float = 1):
+        """Increment the counter by `amount`."""
+        try:
+            self._local.shard[0] += amount
+        except AttributeError:
+            self._new_shard()[0] += amount
+
+    @property
+    def value(self) -> float:
+        """Current value, summed over all threads."""
+        return self._merged()[0]
+
+    def samples(self) -> Iterable[str]:
+        yield f"{self.name}_total{self._label_str()} {_format(self.value)}"
+
+
+class Histogram(_ShardedMetric):
+    """Distribution of observed values, counted in buckets."""
+
+    type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        labels: dict[str, str],
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, labels)
+        self.buckets = tuple(sorted(buckets))
+        if not self.buckets or self.buckets[-1] != math.inf:
+            self.buckets = (*self.buckets, math.inf)
+
+    def _empty_shard(self) -> list[float]:
+        # a count for each bucket, then sum
+        return [0.0] * (len(self.buckets) + 1)
+
+    def observe(self, value: float):
+        """Record an observation."""
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+        shard[bisect_left(self.buckets, value)] += 1
+        shard[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        merged = self._merged()
+        cumulative = 0.0
+        for bucket, count in zip(self.buckets, merged[:-1], strict=True):
+            cumulative += count
+            le = 'le="' + _format(bucket) + '"'
+            yield f"{self.name}_bucket{self._label_str(le)} {_format(cumulative)}"
+        yield f"{self.name}_count{self._label_str()} {_format(cumulative)}"
+        yield f"{self.name}_sum{self._label_str()} {_format(merged[-1])}"
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, labels: dict[str, str]) -> None:
+        super().__init__(name, labels)
+        self.value = 0.0
+
+    def set(self, value: float):
+        """Set the gauge to `value`."""
+        self.value = value
+
+    def inc(self, amount: float = 1):
+        """Increment the gauge by `amount`."""
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1):
+        """Decrement the gauge by `amount`."""
+        self.inc(-amount)
+
+    def samples(self) -> Iterable[str]:
+        yield f"{self.name}{self._label_str()} {_format(self.value)}"
+
+
+class MetricsRegistry:
+    """Collection of metrics, created on first use and identified by name and labels."""
+
+    def __init__(self) -> None:
+        self._families: dict[str, tuple[str, str, dict[tuple, _Metric]]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, kind: type[_Metric], name: str, description: str, labels, **kwargs):
+        labels = labels or {}
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            if name not in self._families:
+                self._families[name] = (kind.type, description, {})
+            family_type, _, metrics = self._families[name]
+            if family_type != kind.type:
+                raise ValueError(f"Metric {name} is already defined as a {family_type}")
+            if key not in metrics:
+                metrics[key] = kind(name, labels, **kwargs)
+            return metrics[key]
+
+    def counter(self, name: str, description: str = "", labels: dict | None = None) -> Counter:
+        """Get or create a counter."""
+        return self._get(Counter, name, description, labels)
+
+    def gauge(self, name: str, description: str = "", labels: dict | None = None) -> Gauge:
+        """Get or create a gauge."""
+        return self._get(Gauge, name, description, labels)
+
+    def histogram(
+        self,
+        name: str,
+        description: str = "",
+        labels: dict | None = None,
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        """Get or create a histogram."""
+        return self._get(Histogram, name, description, labels, buckets=buckets)
+
+    def render(self) -> str:
+        """Render all metrics in OpenMetrics text format."""
+        with self._lock:
+            families = [(k, v[0], v[1], list(v[2].values())) for k, v in self._families.items()]
+        lines = []
+        for name, family_type, description, metrics in families:
+            lines.append(f"# TYPE {name} {family_type}")
+            if description:
+                lines.append(f"# HELP {name} {_escape(description)}")
+            for metric in metrics:
+                lines.extend(metric.samples())
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str):
+        """Atomically write all metrics to `path`."""
+        write_atomic(path, self.render())
+
+
+class MetricsWriter:
+    """Periodically write metrics to a file from a background thread.
+
+    Metrics are also written a last time when stopping it.
+    """
+
+    def __init__(self, registry: MetricsRegistry, path: str, interval: float = 15) -> None:
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.registry.write(self.path)
+
+    def __enter__(self) -> MetricsWriter:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_):
+        self._stop.set()
+        self._thread.join()
+        self.registry.write(self.path)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
@@ -0,0 +1,199 @@
+"""Data-parallel map over worker processes.
+
+The function and the config are sent to each worker once, by the pool initializer,
+then items are sent in chunks. Unless fixed, chunk size adapts to how long items
+take, so that each chunk takes about `TARGET_CHUNK_SECONDS`.
+"""
+from __future__ import annotations
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from itertools import islice
+import logging
+import os
+import time
+import traceback
+from typing import Any, Callable, Iterable, Iterator
+
+from deric.logs import LogListener, setup_worker_logging
+
+TARGET_CHUNK_SECONDS = 0.1
+MAX_CHUNK_SIZE = 1 << 14
+
+# set in worker processes by `_init_worker`
+_worker_fn: Callable | None = None
+_worker_config: Any = None
+
+
+class ParallelMapError(RuntimeError):
+    """Some items of a `parallel_map` failed, `errors` holds (item index, error) pairs."""
+
+    def __init__(self, errors: list[tuple[int, BaseException]], total: int) -> None:
+        super().__init__(f"{len(errors)} of {total} items failed")
+        self.errors = errors
+
+
+class WorkerStats:
+    """Items, chunks, errors and busy time of a worker process."""
+
+    def __init__(self) -> None:
+        self.items = 0
+        self.chunks = 0
+        self.errors = 0
+        self.seconds = 0.0
+
+    def __repr__(self) -> str:
+        return (
+            f"WorkerStats(items={self.items}, chunks={self.chunks}, "
+            f"errors={self.errors}, seconds={self.seconds:.3f})"
+        )
+
+
+def _init_worker(fn: Callable, config: Any, log_queue: Any, level: int):
+    global _worker_fn, _worker_config
+    setup_worker_logging(log_queue, level)
+    _worker_fn = fn
+    _worker_config = config
+
+
+def _run_chunk(start: int, items: list) -> tuple[int, list, list, float]:
+    """Call the worker function on `items`, collecting errors instead of stopping."""
+    began = time.perf_counter()
+    results = []
+    errors = []
+    for i, item in enumerate(items, start):
+        try:
+            results.append(_worker_fn(_worker_config, item))
+        except Exception as e:
+            errors.append((i, e, traceback.format_exc()))
+    return os.getpid(), results, errors, time.perf_counter() - began
+
+
+class _Chunks:
+    """Chunks of items submitted to a pool, with chunk size adapting to item duration."""
+
+    def __init__(
+        self,
+        items: Iterable,
+        pool: ProcessPoolExecutor,
+        workers: int,
+        chunk_size: int | None,
+    ) -> None:
+        # with a known number of items, keep at least 4 chunks per worker to balance load
+        self.max_size = MAX_CHUNK_SIZE
+        if hasattr(items, "__len__"):
+            self.max_size = max(1, min(self.max_size, len(items) // (4 * workers)))
+        self.items = iter(items)
+        self.pool = pool
+        self.max_pending = 2 * workers
+        self.chunk_size = chunk_size
+        self.pending: dict[Future, int] = {}
+        self.submitted = 0  # items submitted so far
+        self.chunks = 0
+        self.processed = 0
+        self.busy = 0.0
+        self.exhausted = False
+
+    def next_size(self) -> int:
+        if self.chunk_size:
+            return self.chunk_size
+        if not self.busy:
+            return 1
+        return max(1, min(self.max_size, round(TARGET_CHUNK_SECONDS * self.processed / self.busy)))
+
+    def submit(self):
+        """Submit chunks until enough are pending or items are exhausted."""
+        while not self.exhausted and len(self.pending) < self.max_pending:
+            chunk = list(islice(self.items, self.next_size()))
+            if not chunk:
+                self.exhausted = True
+                return
+            self.pending[self.pool.submit(_run_chunk, self.submitted, chunk)] = self.chunks
+            self.submitted += len(chunk)
+            self.chunks += 1
+
+    def completed(self) -> Iterator[tuple[int, int, list, list, float]]:
+        """Wait for pending chunks, yield (index, pid, results, errors, seconds) of done ones."""
+        done, _ = wait(self.pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            index = self.pending.pop(future)
+            pid, results, errors, elapsed = future.result()
+            self.processed += len(results) + len(errors)
+            self.busy += elapsed
+            yield index, pid, results, errors, elapsed
+
+
+def parallel_map(
+    fn: Callable[[Any, Any], Any],
+    items: Iterable,
+    config: Any = None,
+    *,
+    workers: int | None = None,
+    chunk_size: int | None = None,
+    ordered: bool = True,
+    stats: dict[int, WorkerStats] | None = None,
+) -> Iterator:
+    """Yield `fn(config, item)` for each of `items`, computed by `workers` processes.
+
+    `fn` must be picklable, i.e. defined at module level. Results are yielded as soon
+    as they're ready, in the order of `items` if `ordered`. Failed items are logged and
+    skipped, a `ParallelMapError` is raised after all the others are done. Statistics
+    of each worker, by pid, are logged at the end and stored in `stats` if given.
+    """
+    workers = workers or os.cpu_count() or 1
+    stats = {} if stats is None else stats
+    errors: list[tuple[int, BaseException]] = []
+    done_chunks: dict[int, list] = {}
+    next_chunk = 0  # next chunk to yield if `ordered`
+
+    listener = LogListener(level=logging.getLogger().getEffectiveLevel())
+    with listener:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(fn, config, *listener.initargs),
+        )
+        chunks = _Chunks(items, pool, workers, chunk_size)
+        try:
+            chunks.submit()
+            while chunks.pending:
+                for index, pid, results, chunk_errors, elapsed in chunks.completed():
+                    _record(stats.setdefault(pid, WorkerStats()), results, chunk_errors, elapsed)
+                    for i, error, tb in chunk_errors:
+                        logging.error("Item %d failed on worker %d:\n%s", i, pid, tb)
+                        errors.append((i, error))
+                    done_chunks[index] = results
+                chunks.submit()
+
+                if ordered:
+                    while next_chunk in done_chunks:
+                        yield from done_chunks.pop(next_chunk)
+                        next_chunk += 1
+                else:
+                    while done_chunks:
+                        yield from done_chunks.popitem()[1]
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        pool.shutdown()
+
+    _log_stats(stats)
+    if errors:
+        raise ParallelMapError(sorted(errors, key=lambda e: e[0]), chunks.submitted)
+
+
+def _record(worker: WorkerStats, results: list, errors: list, elapsed: float):
+    worker.items += len(results) + len(errors)
+    worker.chunks += 1
+    worker.errors += len(errors)
+    worker.seconds += elapsed
+
+
+def _log_stats(stats: dict[int, WorkerStats]):
+    for pid, worker in sorted(stats.items()):
+        logging.info(
+            "Worker %d: %d items in %d chunks, %.3fs busy, %d errors",
+            pid,
+            worker.items,
+            worker.chunks,
+            worker.seconds,
+            worker.errors,
+        )
@@ -0,0 +1,100 @@
+"""Low-overhead progress reporting.
+
+Updates are plain counter increments, a background thread renders them at a fixed
+refresh rate: a rich progress bar on the shared console when interactive, periodic
+summary log lines otherwise.
+"""
+from __future__ import annotations
+from collections.abc import Iterable, Iterator
+import logging
+import threading
+import time
+from typing import TypeVar
+
+from rich.progress import Progress as RichProgress
+
+from deric import logs
+
+
+T = TypeVar("T")
+
+
+class Progress:
+    """Progress of a single task.
+
+    Use as a context manager, calling `advance` (or iterating over `track`) inside it:
+
+        with self.progress("items", total=len(items)) as progress:
+            for item in items:
+                ...
+                progress.advance()
+    """
+
+    def __init__(
+        self,
+        description: str,
+        total: int | None = None,
+        *,
+        refresh_per_second: float = 4,
+        log_interval: float = 10,
+        plain: bool | None = None,
+    ) -> None:
+        self.description = description
+        self.total = total
+        self.completed = 0
+        self.refresh_per_second = refresh_per_second
+        # seconds between summary lines in plain mode
+        self.log_interval = log_interval
+        self.plain = not logs.is_interactive() if plain is None else plain
+
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._start_time = 0.0
+
+    def advance(self, n: int = 1):
+        """Mark `n` more items as completed."""
+        self.completed += n
+
+    def track(self, iterable: Iterable[T]) -> Iterator[T]:
+        """Iterate over `iterable`, advancing by one at each item."""
+        for item in iterable:
+            yield item
+            self.completed += 1
+
+    def summary(self) -> str:
+        """Get a one-line summary of the progress."""
+        elapsed = time.perf_counter() - self._start_time
+        rate = self.completed / elapsed if elapsed > 0 else 0.0
+        if self.total:
+            done = f"{self.completed}/{self.total} ({100 * self.completed / self.total:.1f}%)"
+        else:
+            done = str(self.completed)
+        return f"{self.description}: {done} in {elapsed:.1f}s, {rate:.1f} it/s"
+
+    def _render_rich(self):
+        with RichProgress(console=logs.console, auto_refresh=False) as progress:
+            task = progress.add_task(self.description, total=self.total)
+            while not self._stop.wait(1 / self.refresh_per_second):
+                progress.update(task, completed=self.completed, refresh=True)
+            progress.update(task, completed=self.completed, refresh=True)
+
+    def _render_plain(self):
+        while not self._stop.wait(self.log_interval):
+            logging.info(self.summary())
+
+    def __enter__(self) -> Progress:
+        self._start_time = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._render_plain if self.plain else self._render_rich,
+            name=f"progress-{self.description}",
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self.plain:
+            logging.info(self.summary())
@@ -0,0 +1,134 @@
+"""Stages of a command, run concurrently following their dependencies."""
+from __future__ import annotations
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    wait,
+)
+import logging
+import time
+from typing import Any, Callable
+
+
+def stage(*after: str) -> Callable:
+    """Mark a `Command` method as a stage, to be run after the `after` stages.
+
+    The method is called with the config and the results of its dependencies as keyword
+    arguments:
+
+        @stage("fetch_a", "fetch_b")
+        def merge(self, config, fetch_a, fetch_b):
+            ...
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        fn._stage_after = after
+        return fn
+
+    return decorator
+
+
+def collect_stages(cls: type) -> dict[str, tuple[str, ...]]:
+    """Get stages of `cls`, with their dependencies, checking the graph is a DAG."""
+    stages = {
+        name: getattr(cls, name)._stage_after
+        for name in dir(cls)
+        if hasattr(getattr(cls, name, None), "_stage_after")
+    }
+    for name, after in stages.items():
+        for dep in after:
+            if dep not in stages:
+                raise ValueError(f"Stage {name} of {cls.__name__} depends on unknown stage {dep}")
+    if len(topological_order(stages)) != len(stages):
+        raise ValueError(f"Stages of {cls.__name__} have circular dependencies")
+    return stages
+
+
+def topological_order(stages: dict[str, tuple[str, ...]]) -> list[str]:
+    """Sort stages so that each one comes after its dependencies (cycles are left out)."""
+    remaining = {name: len(after) for name, after in stages.items()}
+    order = [name for name, n in remaining.items() if n == 0]
+    for name in order:
+        for other, after in stages.items():
+            if name in after:
+                remaining[other] -= 1
+                if remaining[other] == 0:
+                    order.append(other)
+    return order
+
+
+def _timed_call(fn: Callable, *args, **kwargs) -> tuple[Any, float]:
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def _call_stage(cls: type, name: str, *args, **kwargs) -> tuple[Any, float]:
+    # in worker processes stages run on a bare instance, command state is not shared
+    return _timed_call(getattr(object.__new__(cls), name), *args, **kwargs)
+
+
+def run_stages(
+    command: Any,
+    config: Any,
+    stages: dict[str, tuple[str, ...]],
+    *,
+    executor: str = "thread",
+    max_workers: int | None = None,
+) -> dict[str, Any]:
+    """Run `stages` of `command`, concurrently as soon as their dependencies are done.
+
+    Stop at the first failing stage, without starting any other, and raise its error.
+    """
+    if executor not in ("thread", "process"):
+        raise ValueError(f"Unknown stage executor {executor}")
+
+    waiting_for = {name: set(after) for name, after in stages.items()}
+    results: dict[str, Any] = {}
+    futures: dict[Future, str] = {}
+    start = time.perf_counter()
+
+    pool: Executor = (
+        ThreadPoolExecutor(max_workers=max_workers)
+        if executor == "thread"
+        else ProcessPoolExecutor(max_workers=max_workers)
+    )
+
+    def submit_ready():
+        for name in [name for name, after in waiting_for.items() if not after]:
+            del waiting_for[name]
+            kwargs = {dep: results[dep] for dep in stages[name]}
+            logging.info("Starting stage %s of %s", name, command.name)
+            if executor == "thread":
+                future = pool.submit(_timed_call, getattr(command, name), config, **kwargs)
+            else:
+                future = pool.submit(_call_stage, type(command), name, config, **kwargs)
+            futures[future] = name
+
+    try:
+        submit_ready()
+        while futures:
+            done, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = futures.pop(future)
+                try:
+                    results[name], elapsed = future.result()
+                except Exception:
+                    logging.error("Stage %s of %s failed", name, command.name)
+                    raise
+                logging.info("Stage %s of %s done in %.3fs", name, command.name, elapsed)
+                for after in waiting_for.values():
+                    after.discard(name)
+            submit_ready()
+    except BaseException:
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+
+    logging.info(
+        "All %d stages of %s done in %.3fs", len(stages), command.name, time.perf_counter() - start,
+    )
+    return results
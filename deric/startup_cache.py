@@ -0,0 +1,128 @@
+"""On-disk cache of the argument parser of a command tree.
+
+The parser is pickled, along with a fingerprint of the commands source files and
+`Config`, so that later starts can load it instead of building it again from the
+commands definitions. There is a single entry per root command, replaced when the
+fingerprint changes.
+"""
+from __future__ import annotations
+import argparse
+import inspect
+import io
+import logging
+import os
+import pickle
+
+from deric.cache import fingerprint
+from deric.files import write_atomic
+
+
+# changed when pickled parsers are no longer compatible
+CACHE_FORMAT = 3
+
+
+def fingerprint_commands(root: type) -> str:
+    """Hash source file (path, mtime and size) and `Config` of each command in the tree.
+
+    Raise TypeError if some command has no source file (e.g. defined interactively).
+    """
+    parts = []
+    commands = [root]
+    for cmd in commands:
+        path = inspect.getfile(cmd)
+        stat = os.stat(path)
+        parts.append(
+            [
+                f"{cmd.__module__}.{cmd.__qualname__}",
+                path,
+                stat.st_mtime_ns,
+                stat.st_size,
+                cmd.name,
+                cmd.description,
+                cmd.cache_results,
+                # canonical values: e.g. sets are sorted, their repr depends on hashing
+                [
+                    [name, repr(ftype), field.default, field.description, field.json_schema_extra]
+                    for name, (ftype, field) in cmd._fields().items()
+                ],
+            ],
+        )
+        commands.extend(cmd.subcommands)
+    return fingerprint(CACHE_FORMAT, parts)
+
+
+def entry_name(root: type) -> str:
+    """Get the name of the cache entry of the command tree of `root`."""
+    return f"{root.__module__}.{root.__qualname__}"
+
+
+def _identity(string):
+    return string
+
+
+# objects of argparse that can't be pickled as they are: the function registered for
+# `type=None` is local to `ArgumentParser.__init__` and `SUPPRESS` is compared by
+# identity.
+_PERSISTENT = {"suppress": argparse.SUPPRESS, "identity": _identity}
+
+
+class _ParserPickler(pickle.Pickler):
+    """Pickler for argparse parsers."""
+
+    def persistent_id(self, obj):
+        if obj is argparse.SUPPRESS:
+            return "suppress"
+        if getattr(obj, "__module__", None) == "argparse" and getattr(
+            obj, "__qualname__", "",
+        ).endswith("<locals>.identity"):
+            return "identity"
+        return None
+
+
+class _ParserUnpickler(pickle.Unpickler):
+    """Unpickler for parsers pickled by `_ParserPickler`."""
+
+    def persistent_load(self, pid):
+        return _PERSISTENT[pid]
+
+
+def dumps_parser(parser: argparse.ArgumentParser) -> bytes:
+    """Pickle `parser`, including subparsers."""
+    buffer = io.BytesIO()
+    _ParserPickler(buffer, protocol=pickle.HIGHEST_PROTOCOL).dump(parser)
+    return buffer.getvalue()
+
+
+def loads_parser(data: bytes) -> argparse.ArgumentParser:
+    """Unpickle a parser pickled by `dumps_parser`."""
+    return _ParserUnpickler(io.BytesIO(data)).load()
+
+
+def load_parser(directory: str, name: str, key: str) -> argparse.ArgumentParser | None:
+    """Load the parser of entry `name`, if any and stored for `key`."""
+    try:
+        with open(os.path.join(directory, f"{name}.pickle"), "rb") as file:
+            unpickler = _ParserUnpickler(file)
+            # the key is read first, a stale parser is not unpickled
+            if unpickler.load() != key:
+                return None
+            return unpickler.load()
+    except FileNotFoundError:
+        return None
+    except (pickle.UnpicklingError, EOFError, AttributeError, ImportError, KeyError) as e:
+        logging.debug("Ignoring invalid startup cache %s: %s", name, e)
+        return None
+
+
+def store_parser(directory: str, name: str, key: str, parser: argparse.ArgumentParser):
+    """Store `parser` for `key` as entry `name`, replacing any previous one."""
+    buffer = io.BytesIO()
+    try:
+        pickler = _ParserPickler(buffer, protocol=pickle.HIGHEST_PROTOCOL)
+        pickler.dump(key)
+        pickler.dump(parser)
+    except (pickle.PicklingError, TypeError, AttributeError) as e:
+        logging.debug("Can't store startup cache %s: %s", name, e)
+        return
+    os.makedirs(directory, exist_ok=True)
+    write_atomic(os.path.join(directory, f"{name}.pickle"), buffer.getvalue())
@@ -0,0 +1,120 @@
+"""Streaming of results between chained commands.
+
+A `run` returning an iterator (e.g. being a generator) or an async iterator (e.g. being
+an async generator) streams its items to the `run` of the next command, which gets them
+as a plain iterator. Items can be produced on a separate thread, buffered in a bounded
+queue, so that producer and consumer overlap. The time spent producing items is
+measured, to be accounted to the producer.
+"""
+from __future__ import annotations
+import asyncio
+from collections.abc import AsyncIterator, Iterator
+import queue
+import threading
+import time
+from typing import Any
+
+_END = object()
+
+
+def is_stream(value: Any) -> bool:
+    """Check if `value` is an iterator or an async iterator."""
+    return isinstance(value, (Iterator, AsyncIterator))
+
+
+def iter_async(source: AsyncIterator) -> Iterator:
+    """Iterate over an async iterator, on an event loop of its own."""
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(source.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        aclose = getattr(source, "aclose", None)
+        if aclose is not None:
+            loop.run_until_complete(aclose())
+        loop.close()
+
+
+class TimedIterator(Iterator):
+    """Iterator over `source`, adding the time spent producing items to `seconds`."""
+
+    def __init__(self, source: Iterator) -> None:
+        self.source = source
+        self.seconds = 0.0
+
+    def __next__(self) -> Any:
+        start = time.perf_counter()
+        try:
+            return next(self.source)
+        finally:
+            self.seconds += time.perf_counter() - start
+
+    def close(self):
+        """Close `source`, if it can be closed (e.g. it's a generator)."""
+        close = getattr(self.source, "close", None)
+        if close is not None:
+            close()
+
+
+class ThreadedStream(Iterator):
+    """Iterator consuming `source` on a background thread, buffering up to `maxsize` items.
+
+    Errors of the source are raised by the consumer. Call `close` to stop the producer
+    and wait for it, if the consumer doesn't exhaust the stream.
+    """
+
+    def __init__(self, source: Iterator, maxsize: int = 1024) -> None:
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        self._closed = threading.Event()
+        self._done = False
+        self._thread = threading.Thread(
+            target=self._produce, args=(source,), name="stream-producer", daemon=True,
+        )
+        self._thread.start()
+
+    def _put(self, item: Any) -> bool:
+        """Put `item` in the queue, return False if the stream was closed meanwhile."""
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, source: Iterator):
+        try:
+            for item in source:
+                if not self._put((item, None)):
+                    break
+            else:
+                self._put((_END, None))
+        except BaseException as e:
+            self._put((_END, e))
+        finally:
+            close = getattr(source, "close", None)
+            if close is not None:
+                close()
+
+    def __next__(self) -> Any:
+        if self._done:
+            raise StopIteration
+        item, error = self._queue.get()
+        if item is _END:
+            self._done = True
+            if error is not None:
+                raise error
+            raise StopIteration
+        return item
+
+    def close(self, timeout: float | None = None):
+        """Stop the producer, as soon as it produces its next item, and close the source.
+
+        Return once the source is closed, or after `timeout` seconds if set.
+        """
+        self._closed.set()
+        self._thread.join(timeout)
+
@@ -1 +1,3 @@
 from deric.types.enum_by_name import EnumByName as EnumByName
+from deric.types.packed import PackedFloatList as PackedFloatList
+from deric.types.packed import PackedIntList as PackedIntList
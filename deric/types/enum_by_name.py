@@ -3,51 +3,66 @@ Enum by name to use in config.
 
 See https://github.com/pydantic/pydantic/discussions/2980
 """
+from __future__ import annotations
 from enum import Enum
+from operator import attrgetter
+from typing import Any
 
-# from pydantic import GetJsonSchemaHandler
-# from pydantic_core import CoreSchema
+from pydantic import GetCoreSchemaHandler, GetJsonSchemaHandler
+from pydantic_core import CoreSchema, PydanticCustomError, core_schema
 
 
 class EnumByName(Enum):
-    """A custom Enum type for pydantic to validate by name."""
+    """A custom Enum type for pydantic to validate by name.
 
-    @classmethod
-    def __get_validators__(cls):
-        # yield our validator
-        yield cls._validate
-
-    # I'm not sure if this is needed or not
-    # @classmethod
-    # def __get_pydantic_json_schema__(
-    #   cls, core_schema: CoreSchema, handler: GetJsonSchemaHandler
-    # ) -> dict[str, Any]:
-    #   json_schema = super().__get_pydantic_json_schema__(core_schema, handler)
-    #   json_schema = handler.resolve_ref_schema(json_schema)
-    #   json_schema.update(enum=list(cls.__members__.keys()))
-    #   return json_schema
+    Subclass with `case_insensitive=True` to also accept names in any case:
+
+        class Color(EnumByName, case_insensitive=True):
+            red = (255, 0, 0)
+    """
+
+    def __init_subclass__(cls, *, case_insensitive: bool = False, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._case_insensitive = case_insensitive
 
     @classmethod
-    def _validate(cls, v, _):
-        """Validate enum reference, `v`.
+    def __get_pydantic_core_schema__(
+        cls, _source: Any, _handler: GetCoreSchemaHandler,
+    ) -> CoreSchema:
+        """Validate members as they are and names through a precomputed name→member map.
 
-        We check:
-          1. If it is a member of this Enum
-          2. If we can find it by name.
+        A single validator call per value: the map lookup, or the error reporting
+        the invalid input.
         """
-        # is the value an enum member?
-        try:
-            if v in cls:
+        case_insensitive = getattr(cls, "_case_insensitive", False)
+        by_name = {
+            (k.lower() if case_insensitive else k): v for k, v in cls.__members__.items()
+        }
+        if len(by_name) != len(cls.__members__):
+            raise TypeError(f"Names of {cls.__name__} are not unique ignoring case")
+        expected = list(cls.__members__.keys())
+
+        def validate(v: Any) -> EnumByName:
+            if isinstance(v, cls):
                 return v
-        except TypeError:
-            pass
-
-        # not a member...look up by name
-        try:
-            return cls[v]
-        except KeyError:
-            name = cls.__name__
-            expected = list(cls.__members__.keys())
-            raise ValueError(
-                f"{v} not found for enum {name}. Expected one of: {expected}",
-            ) from None
+            try:
+                return by_name[v.lower() if case_insensitive else v]
+            except (KeyError, TypeError, AttributeError):
+                raise PydanticCustomError(
+                    "enum_by_name",
+                    "{input} not found for enum {enum}. Expected one of: {expected}",
+                    {"input": repr(v), "enum": cls.__name__, "expected": str(expected)},
+                ) from None
+
+        return core_schema.no_info_plain_validator_function(
+            validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                attrgetter("name"), when_used="json",
+            ),
+        )
+
+    @classmethod
+    def __get_pydantic_json_schema__(
+        cls, _core_schema: CoreSchema, _handler: GetJsonSchemaHandler,
+    ) -> dict[str, Any]:
+        return {"enum": list(cls.__members__.keys()), "title": cls.__name__}
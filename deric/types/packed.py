@@ -0,0 +1,94 @@
+"""
+Compact numeric lists to use in config.
+
+Values are stored in an `array.array` instead of a list of Python objects, and are
+passed as they are through validation, `model_dump` and `RuntimeConfig`.
+"""
+from __future__ import annotations
+from array import array
+from typing import Any, Callable, Iterable
+
+from pydantic import GetCoreSchemaHandler, GetJsonSchemaHandler
+from pydantic_core import CoreSchema, core_schema
+
+
+class _PackedList(array):
+    """Base of packed lists, `array.array` with fixed typecode."""
+
+    typecode_: str
+    item_type: Callable[[Any], Any]
+    json_type: str
+
+    def __new__(cls, *args):
+        # array pickling passes typecode too
+        if len(args) == 2:
+            return super().__new__(cls, *args)
+        return super().__new__(cls, cls.typecode_, *args)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.tolist()!r})"
+
+    def __copy__(self) -> _PackedList:
+        return type(self)(self)
+
+    def __deepcopy__(self, _memo) -> _PackedList:
+        return type(self)(self)
+
+    @classmethod
+    def _from_items(cls, items: Iterable) -> _PackedList:
+        # strings are converted, anything else must already be a number
+        item_type = cls.item_type
+        return cls(item_type(x) if isinstance(x, str) else x for x in items)
+
+    @classmethod
+    def _validate(cls, v: Any) -> _PackedList:
+        """Validate a packed list, an iterable of numbers or a comma-separated string."""
+        if type(v) is cls:
+            return v
+        try:
+            if isinstance(v, str):
+                return cls(map(cls.item_type, filter(None, (x.strip() for x in v.split(",")))))
+            if isinstance(v, (list, tuple)):
+                # fast path, no conversion needed
+                try:
+                    return cls(v)
+                except TypeError:
+                    return cls._from_items(v)
+            if isinstance(v, (dict, bytes)) or not isinstance(v, Iterable):
+                raise TypeError(f"expected a sequence, got {type(v).__name__}")
+            return cls._from_items(v)
+        except (TypeError, ValueError, OverflowError) as e:
+            raise ValueError(f"Invalid {cls.__name__}: {e}") from None
+
+    @classmethod
+    def __get_pydantic_core_schema__(
+        cls, _source: Any, _handler: GetCoreSchemaHandler,
+    ) -> CoreSchema:
+        return core_schema.no_info_plain_validator_function(
+            cls._validate,
+            serialization=core_schema.plain_serializer_function_ser_schema(
+                array.tolist, when_used="json",
+            ),
+        )
+
+    @classmethod
+    def __get_pydantic_json_schema__(
+        cls, _core_schema: CoreSchema, _handler: GetJsonSchemaHandler,
+    ) -> dict[str, Any]:
+        return {"type": "array", "items": {"type": cls.json_type}, "title": cls.__name__}
+
+
+class PackedIntList(_PackedList):
+    """List of 64-bit signed integers."""
+
+    typecode_ = "q"
+    item_type = int
+    json_type = "integer"
+
+
+class PackedFloatList(_PackedList):
+    """List of double precision floats."""
+
+    typecode_ = "d"
+    item_type = float
+    json_type = "number"
@@ -0,0 +1,130 @@
+"""Watchdog sampling stacks of commands that run for too long.
+
+Samples are aggregated as collapsed stacks (one `frame;frame;... count` line per
+distinct stack), the input format of flamegraph tools.
+"""
+from __future__ import annotations
+from collections import Counter
+import logging
+import os
+import queue
+import selectors
+import sys
+import threading
+import time
+
+from deric.files import write_atomic
+
+
+# threads whose innermost frame is in these modules are waiting, not working
+_IDLE_FILES = frozenset(module.__file__ for module in (queue, selectors, threading))
+
+
+class Watchdog:
+    """Sample all thread stacks while a command runs longer than `threshold` seconds.
+
+    Nothing is done before the threshold, other than waiting on an event. After it,
+    stacks of threads not idle are sampled every `interval` seconds; every `report_interval` seconds, and
+    when the watchdog is stopped, they are written to `output` (if set) and the
+    hottest frames are logged.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        threshold: float,
+        *,
+        output: str | None = None,
+        interval: float = 0.05,
+        report_interval: float = 30,
+        top: int = 5,
+    ) -> None:
+        self.name = name
+        self.threshold = threshold
+        self.output = output
+        self.interval = interval
+        self.report_interval = report_interval
+        self.top = top
+
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"watchdog-{name}", daemon=True)
+
+    def sample(self):
+        """Add a sample of the stacks of all the threads but the watchdog one.
+
+        Threads waiting on locks, events, queues or selectors are left out.
+        """
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own or frame.f_code.co_filename in _IDLE_FILES:
+                continue
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(
+                    f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})",
+                )
+                frame = frame.f_back
+            frames.append(names.get(ident, str(ident)))
+            self.stacks[";".join(reversed(frames))] += 1
+        self.samples += 1
+
+    def hottest(self) -> list[tuple[str, int]]:
+        """Get the frames found most often at the top of sampled stacks."""
+        leaves: Counter[str] = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return leaves.most_common(self.top)
+
+    def report(self, *, final: bool = False):
+        """Write collapsed stacks to `output` and log the hottest frames."""
+        written = False
+        if self.output:
+            # errors are logged, not to stop sampling
+            try:
+                write_atomic(
+                    self.output,
+                    "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common()),
+                )
+                written = True
+            except OSError as e:
+                logging.error("Can't write stacks of %s to %s: %s", self.name, self.output, e)
+
+        total = sum(self.stacks.values())
+        summary = "\n".join(
+            f"  {100 * count / total:5.1f}% {frame}" for frame, count in self.hottest()
+        )
+        logging.warning(
+            "%s %s, hottest frames over %d samples%s:\n%s",
+            self.name,
+            "done" if final else "still running",
+            self.samples,
+            f" (stacks in {self.output})" if written else "",
+            summary,
+        )
+
+    def _run(self):
+        if self._stop.wait(self.threshold):
+            return
+        logging.warning(
+            "%s running for more than %.1fs, sampling stacks", self.name, self.threshold,
+        )
+        last_report = time.monotonic()
+        while not self._stop.wait(self.interval):
+            self.sample()
+            if time.monotonic() - last_report >= self.report_interval:
+                self.report()
+                last_report = time.monotonic()
+        if self.samples:
+            self.report(final=True)
+
+    def __enter__(self) -> Watchdog:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *_):
+        self._stop.set()
+        self._thread.join()
@@ -0,0 +1,93 @@
+import io
+
+import mock
+import pytest
+
+from deric import Command, arg
+from deric.arguments import ArgumentParserError
+from deric.types import PackedIntList
+
+
+class ListApp(Command):
+    name = "list_app"
+    description = "Print collections"
+
+    Config = {
+        "numbers": arg(list[int], [], "numbers"),
+        "names": arg(set[str], set(), "names"),
+        "ids": arg(PackedIntList, PackedIntList(), "packed ids"),
+    }
+
+    def run(self, config):
+        return config.numbers, config.names, config.ids
+
+
+def test_collection_args():
+    config = ListApp.invoke(
+        ["--numbers", "1", "--numbers", "2", "--names", "a", "--names", "a", "--ids", "3,4"],
+    ).config
+    assert config.numbers == [1, 2]
+    assert config.names == {"a"}
+    assert config.ids == PackedIntList([3, 4])
+
+
+def test_collection_args_escape():
+    config = ListApp.invoke(["--names", "@@user", "--names", "@@@@x", "--numbers", "1"]).config
+    assert config.names == {"@user", "@@@x"}
+
+
+def test_collection_args_invalid(capsys):
+    with pytest.raises(ArgumentParserError, match="argument --numbers: invalid int value: 'x'"):
+        ListApp.invoke(["--numbers", "x"])
+    assert capsys.readouterr().err == ""
+
+    with mock.patch("sys.argv", ["main.py", "--numbers", "x"]):
+        with pytest.raises(SystemExit):
+            ListApp()
+    assert "argument --numbers: invalid int value: 'x'" in capsys.readouterr().err
+
+
+def test_collection_args_files(tmp_path):
+    lines = tmp_path / "numbers.txt"
+    lines.write_bytes(b"1\r\n2\n\n3\n")
+    nul = tmp_path / "names.bin"
+    nul.write_bytes(b"with\nnewline\0b\0")
+    ids = tmp_path / "ids.txt"
+    ids.write_text("\n".join(str(i) for i in range(100_000)))
+
+    config = ListApp.invoke(
+        [
+            "--numbers", "0",
+            "--numbers", f"@{lines}",
+            "--names", f"@{nul}",
+            "--ids", f"@{ids}",
+        ],
+    ).config
+    assert config.numbers == [0, 1, 2, 3]
+    assert config.names == {"with\nnewline", "b"}
+    assert config.ids == PackedIntList(range(100_000))
+
+
+def test_collection_args_stdin():
+    stdin = io.TextIOWrapper(io.BytesIO(b"x\ny\n"))
+    with mock.patch("sys.stdin", stdin):
+        config = ListApp.invoke(["--names", "-"]).config
+    assert config.names == {"x", "y"}
+
+
+def test_collection_args_chunks(tmp_path):
+    from deric.arguments import iter_file_values
+
+    path = tmp_path / "values.txt"
+    path.write_text("".join(f"value{i}\n" for i in range(1000)))
+    assert list(iter_file_values(f"@{path}", chunk_size=7)) == [f"value{i}" for i in range(1000)]
+
+
+def test_collection_item_type():
+    from deric.arguments import LazyValues, collection_item_type
+
+    assert collection_item_type(tuple[int, ...]) == (True, int, False)
+    # fixed-length tuples are not collections
+    assert collection_item_type(tuple[int, str]) == (False, None, False)
+    assert collection_item_type(int) == (False, None, False)
+    assert repr(LazyValues([["a"], "@values.txt"])) == "LazyValues([['a'], '@values.txt'])"
@@ -0,0 +1,200 @@
+import os
+import threading
+
+import mock
+import pytest
+
+from deric import Command, arg
+from deric.cache import ResultCache, fingerprint
+
+
+def make_app(cache_dir, calls):
+    class Child(Command):
+        name = "child"
+        description = "Use prepared data"
+
+        Config = {
+            "suffix": arg(str, "!", "suffix to add"),
+        }
+
+        def run(self, config, prepared):
+            print(prepared + config.child.suffix)
+
+    class Prepare(Command):
+        name = "prepare"
+        description = "Expensive preparation"
+
+        subcommands = [Child]
+
+        cache_results = True
+
+        Config = {
+            "source": arg(str, ..., "source to prepare"),
+        }
+
+        def run(self, config):
+            calls.append(config.source)
+            return config.source.upper()
+
+    Prepare.cache_dir = cache_dir
+    return Prepare
+
+
+def test_cache_results(capsys, tmp_path):
+    calls = []
+    app = make_app(str(tmp_path), calls)
+
+    for args, out in [
+        ("main.py --source abc child", "ABC!\n"),
+        # cached, even if the child config changes
+        ("main.py --source abc child --suffix ?", "ABC?\n"),
+        ("main.py --source xyz child", "XYZ!\n"),
+        ("main.py --source abc --no-cache child", "ABC!\n"),
+    ]:
+        with mock.patch("sys.argv", args.split()):
+            app().start()
+        assert capsys.readouterr().out == out
+    assert calls == ["abc", "xyz", "abc"]
+
+
+def test_cache_ignores_log_file(capsys, tmp_path):
+    calls = []
+    app = make_app(str(tmp_path / "cache"), calls)._with_log_file()
+
+    for log_file in ("run1.log", "run2.log"):
+        app.invoke(["--source", "abc", "--log-file", str(tmp_path / log_file), "child"])
+        assert capsys.readouterr().out == "ABC!\n"
+    assert calls == ["abc"]
+
+
+def test_cache_no_cache_flag_only_if_used(capsys):
+    class NoCache(Command):
+        name = "no_cache"
+        description = "Doesn't cache"
+
+        def run(self, config):
+            pass
+
+    assert "--no-cache" not in NoCache._populate_subcommands().format_help()
+    assert "--no-cache" in make_app("", [])._populate_subcommands().format_help()
+
+
+def test_cache_eviction(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=250)
+    cache.put("a", b"a" * 100)
+    os.utime(os.path.join(tmp_path, "a.pickle"), ns=(1, 1))
+    cache.put("b", b"b" * 100)
+    os.utime(os.path.join(tmp_path, "b.pickle"), ns=(2, 2))
+    # "a" is now the most recently used
+    assert cache.get("a") == b"a" * 100
+    cache.put("c", b"c" * 100)
+
+    assert cache.get("a") == b"a" * 100
+    assert cache.get("c") == b"c" * 100
+    try:
+        cache.get("b")
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("b should have been evicted")
+
+
+def test_cache_concurrent_puts(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=1 << 20)
+    errors = []
+
+    def put():
+        try:
+            for i in range(100):
+                cache.put("key", i)
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=put) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert os.listdir(tmp_path) == ["key.pickle"]
+    assert cache.get("key") == 99
+
+
+def test_cache_invalid_entry(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=1 << 20)
+    cache.put("key", list(range(100)))
+    path = os.path.join(tmp_path, "key.pickle")
+    with open(path, "rb") as file:
+        data = file.read()
+    with open(path, "wb") as file:
+        file.write(data[: len(data) // 2])
+
+    with pytest.raises(KeyError):
+        cache.get("key")
+    assert not os.path.exists(path)
+
+
+def test_cache_failed_put(tmp_path):
+    cache = ResultCache(str(tmp_path), max_bytes=1 << 20)
+    with mock.patch("os.replace", side_effect=OSError("disk full")):
+        with pytest.raises(OSError, match="disk full"):
+            cache.put("key", 1)
+    assert os.listdir(tmp_path) == []
+
+
+def test_fingerprint():
+    import enum
+
+    class Color(enum.Enum):
+        RED = 1
+
+    assert fingerprint({"a": 1, "b": [1, 2]}) == fingerprint({"b": [1, 2], "a": 1})
+    assert fingerprint(Color.RED) == fingerprint("RED")
+    assert fingerprint({3, 1, 2}) == fingerprint([1, 2, 3])
+    # other values by repr
+    assert fingerprint(b"x") == fingerprint("b'x'")
+
+
+def test_cache_upstream(capsys, tmp_path, caplog):
+    calls = []
+
+    class Double(Command):
+        name = "double"
+        description = "Double the parent result"
+
+        cache_results = True
+
+        def run(self, config, value):
+            calls.append(value)
+            if callable(value) or value == 0:
+                return lambda: None
+            return value * 2
+
+    class Source(Command):
+        name = "source"
+        description = "Produce a value"
+
+        subcommands = [Double]
+
+        Config = {
+            "value": arg(int, 1, "value to produce"),
+        }
+
+        def run(self, config):
+            if config.value < 0:
+                return lambda: None
+            return config.value
+
+    Double.cache_dir = str(tmp_path)
+
+    # the upstream result is part of the key
+    assert Source.invoke(["--value", "2", "double"]).results == [2, 4]
+    assert Source.invoke(["--value", "2", "double"]).results == [2, 4]
+    assert Source.invoke(["--value", "3", "double"]).results == [3, 6]
+    assert calls == [2, 3]
+
+    # unpicklable upstream and result can't be cached, but commands still run
+    for value in ("-1", "0"):
+        caplog.clear()
+        assert callable(Source.invoke(["--value", value, "double"]).results[1])
+        assert "Can't cache result of double" in caplog.text
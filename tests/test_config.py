@@ -1,5 +1,6 @@
 import os
 import mock
+import pytest
 
 from deric import Command, RuntimeConfig, arg
 
@@ -112,3 +113,98 @@ nested_arg = "q"
         SimpleApp().start()
     captured = capsys.readouterr()
     assert captured.out == "Runnig your_simple_app wasd\nnested\nI'm nested, q\n"
+
+
+def test_config_fragments_directory(capsys, tmp_path):
+    conf_d = os.path.join(tmp_path, "conf.d")
+    os.mkdir(conf_d)
+    with open(os.path.join(conf_d, "00-base.toml"), "w") as file:
+        file.write('string = "frag"\n\n[nested]\nvalue = 1\n')
+    with open(os.path.join(conf_d, "10-nested.toml"), "w") as file:
+        file.write("[nested]\nother = 2\n")
+    with open(os.path.join(conf_d, "ignored.txt"), "w") as file:
+        file.write('string = "ignored"\n')
+
+    class SimpleApp(Command):
+        name = "your_simple_app"
+        description = "Print a value and exit"
+
+        Config = {
+            "string": arg(str, ..., "value to print"),
+            "config_file": arg(str, ..., "config file path"),
+        }
+
+        def run(self, config):
+            print(config.string, config.nested.value, config.nested.other)
+
+    for path in (conf_d, os.path.join(conf_d, "*.toml")):
+        args = ["main.py", "--config-file", path]
+        with mock.patch("sys.argv", args):
+            SimpleApp().start()
+        captured = capsys.readouterr()
+        assert captured.out == "frag 1 2\n"
+
+
+def test_config_file_named_like_pattern(tmp_path):
+    from deric.config_files import load_config_files, resolve_config_files
+
+    path = os.path.join(tmp_path, "conf[prod].toml")
+    with open(path, "w") as file:
+        file.write("value = 1\n")
+    assert resolve_config_files(path) == [path]
+    assert load_config_files(path) == {"value": 1}
+
+
+def test_config_fragments_conflict(tmp_path):
+    from deric.config_files import ConfigConflictError, load_config_files
+
+    with open(os.path.join(tmp_path, "a.toml"), "w") as file:
+        file.write("[table]\nkey = 1\n")
+    with open(os.path.join(tmp_path, "b.toml"), "w") as file:
+        file.write("[table]\nkey = 2\n")
+
+    with pytest.raises(ConfigConflictError, match="'table.key'"):
+        load_config_files(str(tmp_path))
+
+    # same value is not a conflict
+    with open(os.path.join(tmp_path, "b.toml"), "w") as file:
+        file.write('[table]\nkey = 1\nsomething = "x"\n')
+    assert load_config_files(str(tmp_path)) == {"table": {"key": 1, "something": "x"}}
+
+    with open(os.path.join(tmp_path, "c.toml"), "w") as file:
+        file.write("table = 3\n")
+    with pytest.raises(ConfigConflictError, match="'table'"):
+        load_config_files(str(tmp_path))
+
+    # empty table set later as a value
+    os.remove(os.path.join(tmp_path, "b.toml"))
+    with open(os.path.join(tmp_path, "a.toml"), "w") as file:
+        file.write("[table]\n")
+    with pytest.raises(ConfigConflictError, match="'table' in config files .*a.toml and .*c.toml"):
+        load_config_files(str(tmp_path))
+
+    # value set later as a table
+    with open(os.path.join(tmp_path, "d.toml"), "w") as file:
+        file.write("[other]\nkey = 1\n")
+    with open(os.path.join(tmp_path, "a.toml"), "w") as file:
+        file.write("other = 1\n")
+    os.remove(os.path.join(tmp_path, "c.toml"))
+    with pytest.raises(ConfigConflictError, match="'other' in config files .*a.toml and .*d.toml"):
+        load_config_files(str(tmp_path))
+
+    with pytest.raises(FileNotFoundError):
+        load_config_files(os.path.join(tmp_path, "*.missing"))
+
+
+def test_config_fragments_cache(tmp_path):
+    from deric.config_files import parse_config_file
+
+    path = os.path.join(tmp_path, "a.toml")
+    with open(path, "w") as file:
+        file.write("key = 1\n")
+    first = parse_config_file(path)
+    assert parse_config_file(path) is first
+
+    with open(path, "w") as file:
+        file.write("key = 22\n")
+    assert parse_config_file(path) == {"key": 22}
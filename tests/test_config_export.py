@@ -0,0 +1,108 @@
+import json
+import os
+import pathlib
+
+import mock
+import pytest
+import tomlkit
+
+from deric import Command, RuntimeConfig, arg, make_namespace
+from deric.config_export import ConfigExport, to_plain
+from deric.types import EnumByName, PackedIntList
+
+
+class Color(EnumByName):
+    RED = 1
+    GREEN = 2
+
+
+def deep_config(depth):
+    config = {"leaf": 1}
+    for i in range(depth):
+        config = {"level": i, "child": config}
+    return make_namespace(config)
+
+
+def test_to_plain():
+    config = make_namespace(
+        {
+            "color": Color.RED,
+            "tags": {"b", "a"},
+            "values": PackedIntList([1, 2]),
+            "pair": (1, {"x": None}),
+            "path": pathlib.PurePosixPath("data/run.log"),
+            "section": {"path": None, "colors": frozenset({Color.GREEN, Color.RED})},
+        },
+    )
+    assert to_plain(config) == {
+        "color": "RED",
+        "tags": ["a", "b"],
+        "values": [1, 2],
+        "pair": [1, {"x": None}],
+        "path": "data/run.log",
+        "section": {"path": None, "colors": ["GREEN", "RED"]},
+    }
+    toml = tomlkit.parse(ConfigExport(config).toml).unwrap()
+    assert toml["pair"] == [1, {}]
+    assert toml["section"] == {"colors": ["GREEN", "RED"]}
+
+
+def test_deep_config():
+    config = deep_config(5000)
+    d = config.to_dict()
+    plain = to_plain(config)
+    for _ in range(5000):
+        d = d["child"]
+        plain = plain["child"]
+    assert d == plain == {"leaf": 1}
+    assert isinstance(config, RuntimeConfig)
+    assert make_namespace(1) == 1
+
+
+def test_config_export():
+    export = ConfigExport(make_namespace({"b": {"y": 2, "x": None}, "a": Color.GREEN}))
+    assert json.loads(export.json) == {"a": "GREEN", "b": {"x": None, "y": 2}}
+    assert tomlkit.parse(export.toml).unwrap() == {"a": "GREEN", "b": {"y": 2}}
+    # same content, different order
+    other = ConfigExport(make_namespace({"a": Color.GREEN, "b": {"x": None, "y": 2}}))
+    assert export.digest == other.digest
+    assert export.digest != ConfigExport(make_namespace({"a": "RED"})).digest
+
+
+def test_effective_config_written(tmp_path):
+    class ExportApp(Command):
+        name = "export_app"
+        description = "Do nothing"
+
+        Config = {
+            "value": arg(int, 1, "some value"),
+        }
+
+        def run(self, config):
+            pass
+
+    log_file = os.path.join(tmp_path, "run.log")
+    args = f"main.py --log-file {log_file} --value 3".split()
+    with mock.patch("sys.argv", args):
+        app = ExportApp._with_log_file()()
+    with open(os.path.join(tmp_path, "run.config.json")) as file:
+        assert json.load(file)["value"] == 3
+    with open(os.path.join(tmp_path, "run.config.toml")) as file:
+        assert tomlkit.parse(file.read())["log_file"] == log_file
+    assert app.effective_config is app.effective_config
+
+
+def test_config_export_write(tmp_path):
+    export = ConfigExport(make_namespace({"a": 1}))
+    stem = os.path.join(tmp_path, "run.config")
+    toml_path, json_path = export.write(stem)
+    assert os.stat(json_path).st_mode & 0o777 == 0o644
+    assert sorted(os.listdir(tmp_path)) == ["run.config.json", "run.config.toml"]
+
+    # a failed write leaves the previous files in place, and no temporary file
+    with mock.patch("os.replace", side_effect=OSError("disk full")):
+        with pytest.raises(OSError, match="disk full"):
+            ConfigExport(make_namespace({"a": 2})).write(stem)
+    assert sorted(os.listdir(tmp_path)) == ["run.config.json", "run.config.toml"]
+    with open(toml_path) as file:
+        assert tomlkit.parse(file.read())["a"] == 1
@@ -0,0 +1,118 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+
+import pytest
+
+from deric import Command, Invocation, arg
+
+
+class Child(Command):
+    name = "child"
+    description = "Multiply the parent value"
+
+    Config = {
+        "factor": arg(int, 2, "factor to multiply by"),
+    }
+
+    def run(self, config, value):
+        return value * config.child.factor
+
+
+class InvokeApp(Command):
+    name = "invoke_app"
+    description = "Return a value"
+
+    subcommands = [Child]
+
+    Config = {
+        "value": arg(int, ..., "value to return"),
+        "label": arg(str, "x", "some label"),
+    }
+
+    def run(self, config):
+        return config.value
+
+
+def test_invoke():
+    invocation = InvokeApp.invoke(["--value", "3", "child", "--factor", "5"])
+    assert isinstance(invocation, Invocation)
+    assert invocation.config.value == 3
+    assert invocation.config.child.factor == 5
+    assert invocation.results == [3, 15]
+
+
+def test_invoke_env_and_config():
+    config = {"value": 1, "label": "from config", "child": {"factor": 10}}
+    invocation = InvokeApp.invoke(["child"], config=config)
+    assert invocation.results == [1, 10]
+    assert invocation.config.label == "from config"
+    # config is not modified
+    assert config == {"value": 1, "label": "from config", "child": {"factor": 10}}
+
+    env = {"INVOKE_APP_VALUE": "4", "INVOKE_APP_CHILD_FACTOR": "3"}
+    assert InvokeApp.invoke(["child"], env=env, config=config).results == [4, 12]
+    # arguments take precedence over environment variables
+    assert InvokeApp.invoke(["--value", "5", "child"], env=env).results == [5, 15]
+
+
+def test_invoke_concurrent():
+    handlers = list(logging.getLogger().handlers)
+
+    def invoke(i):
+        return InvokeApp.invoke(["--value", str(i), "child", "--factor", str(i)]).results
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(invoke, range(200)))
+    assert results == [[i, i * i] for i in range(200)]
+
+    # no global state is touched
+    assert logging.getLogger().handlers == handlers
+    assert not hasattr(Child, "config")
+
+
+def test_invoke_reuses_parser_and_models():
+    InvokeApp.invoke(["--value", "1", "child"])
+    parser, _ = InvokeApp._parser()
+    model = InvokeApp._config_model()
+    InvokeApp.invoke(["--value", "2", "child"])
+    assert InvokeApp._parser()[0] is parser
+    assert InvokeApp._config_model() is model
+
+
+def test_invoke_subcommand():
+    with pytest.raises(RuntimeError):
+        Child.invoke([])
+
+
+def test_invoke_invalid_arguments(capsys):
+    from deric.arguments import ArgumentParserError
+
+    with pytest.raises(ArgumentParserError, match="unrecognized arguments: --bogus"):
+        InvokeApp.invoke(["--value", "1", "child", "--bogus"])
+    with pytest.raises(ArgumentParserError, match="invalid int value: 'x'") as exc_info:
+        InvokeApp.invoke(["--value", "1", "child", "--factor", "x"])
+    assert exc_info.value.parser.prog.endswith("child")
+    assert capsys.readouterr().err == ""
+
+
+def test_env_args_opt_in(monkeypatch):
+    class EnvApp(Command):
+        name = "git"
+        description = "Return the directory"
+
+        Config = {
+            "dir": arg(str, ".git", "directory"),
+        }
+
+        def run(self, config):
+            return config.dir
+
+    monkeypatch.setenv("GIT_DIR", "/elsewhere/.git")
+    monkeypatch.setattr("sys.argv", ["main.py"])
+    assert EnvApp().config.dir == ".git"
+    # invoke doesn't read os.environ, only `env` when given
+    assert EnvApp.invoke([]).results == [".git"]
+    assert EnvApp.invoke([], env={"GIT_DIR": "x"}).results == ["x"]
+
+    EnvApp.env_args = True
+    assert EnvApp().config.dir == "/elsewhere/.git"
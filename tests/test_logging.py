@@ -1,5 +1,6 @@
 import logging
 import os
+import time
 
 import mock
 
@@ -22,3 +23,106 @@ def test_logging(tmp_path):
     with open(log_file, "r") as file:
         logtext = file.read()
     assert logtext == ("""""")
+    assert "log_plain" in SimpleApp._fields()
+
+
+def test_logging_console_handler(capsys):
+    from logging.handlers import MemoryHandler
+
+    from rich.logging import RichHandler
+
+    from deric.logs import console_handler, is_interactive
+
+    assert isinstance(console_handler(plain=False), RichHandler)
+
+    handler = console_handler(plain=True)
+    assert isinstance(handler, MemoryHandler)
+    # pytest captures output, so it's not interactive
+    assert not is_interactive()
+    assert isinstance(console_handler(), MemoryHandler)
+
+    logger = logging.getLogger("test_logging_console_handler")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    logger.info("buffered")
+    assert capsys.readouterr().err == ""
+    logger.warning("flushed")
+    err = capsys.readouterr().err
+    assert "INFO     buffered\n" in err
+    assert "WARNING  flushed\n" in err
+
+    # buffered records are also flushed periodically
+    logger.info("timed")
+    deadline = time.monotonic() + 5
+    while "timed" not in err and time.monotonic() < deadline:
+        time.sleep(0.05)
+        err += capsys.readouterr().err
+    assert "INFO     timed\n" in err
+    logger.removeHandler(handler)
+    handler.close()
+
+
+def log_in_worker(i):
+    logging.getLogger("worker").info("message %d", i)
+    if i == 0:
+        logging.getLogger("worker").warning("warning")
+    return i
+
+
+def test_logging_worker_processes(caplog):
+    from concurrent.futures import ProcessPoolExecutor
+
+    from deric.logs import LogListener
+
+    caplog.set_level(logging.INFO)
+    with LogListener() as listener:
+        with ProcessPoolExecutor(max_workers=2, **listener.pool_kwargs()) as pool:
+            assert list(pool.map(log_in_worker, range(20))) == list(range(20))
+
+    messages = [r.getMessage() for r in caplog.records if r.name == "worker"]
+    assert sorted(messages) == sorted(["warning"] + [f"message {i}" for i in range(20)])
+
+
+def test_log_listener_stops_threads():
+    import threading
+
+    from deric.logs import LogListener
+
+    before = set(threading.enumerate())
+    with LogListener() as listener:
+        listener.queue.put([])
+    assert set(threading.enumerate()) <= before
+
+
+def test_batch_queue_handler():
+    import queue
+    import threading
+
+    from deric.logs import BatchQueueHandler
+
+    q = queue.Queue()
+    handler = BatchQueueHandler(q, capacity=2, flush_interval=0.01)
+    logger = logging.getLogger("test_batch_queue_handler")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+
+    logger.info("a")
+    assert q.empty()
+    logger.info("b")
+    assert [r.getMessage() for r in q.get_nowait()] == ["a", "b"]
+
+    # periodic flush
+    flusher = threading.Thread(target=handler._flush_periodically, daemon=True)
+    flusher.start()
+    logger.info("c")
+    assert [r.getMessage() for r in q.get(timeout=5)] == ["c"]
+
+    # records that can't be formatted are reported, not raised
+    with mock.patch.object(handler, "handleError") as handle_error:
+        logger.info("%d", "not a number")
+    handle_error.assert_called_once()
+    logger.removeHandler(handler)
+    handler.close()
+    flusher.join()
@@ -0,0 +1,127 @@
+import os
+import threading
+import time
+
+import mock
+import pytest
+
+from deric import Command, arg
+from deric.metrics import MetricsRegistry, MetricsWriter
+
+
+def test_metrics_render():
+    registry = MetricsRegistry()
+    counter = registry.counter("items", "Processed items", {"kind": 'a"b'})
+
+    def work():
+        for _ in range(1000):
+            counter.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.value == 4000
+    assert registry.counter("items", labels={"kind": 'a"b'}) is counter
+
+    registry.gauge("queue").set(3.5)
+    histogram = registry.histogram("latency", buckets=[0.1, 1])
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(2)
+
+    assert registry.render() == (
+        "# TYPE items counter\n"
+        "# HELP items Processed items\n"
+        'items_total{kind="a\\"b"} 4000\n'
+        "# TYPE queue gauge\n"
+        "queue 3.5\n"
+        "# TYPE latency histogram\n"
+        'latency_bucket{le="0.1"} 1\n'
+        'latency_bucket{le="1"} 2\n'
+        'latency_bucket{le="+Inf"} 3\n'
+        "latency_count 3\n"
+        "latency_sum 2.55\n"
+        "# EOF\n"
+    )
+
+
+def test_metrics_file(tmp_path):
+    metrics_file = os.path.join(tmp_path, "app.prom")
+
+    class MetricsApp(Command):
+        name = "metrics_app"
+        description = "Count items"
+
+        Config = {
+            "metrics_file": arg(str, "", "metrics file path"),
+        }
+
+        def run(self, config):
+            self.metrics.counter("items").inc(7)
+
+    args = ["main.py", "--metrics-file", metrics_file]
+    with mock.patch("sys.argv", args):
+        MetricsApp().start()
+
+    with open(metrics_file) as file:
+        text = file.read()
+    assert "items_total 7\n" in text
+    assert 'deric_command_run_seconds_count{command="metrics_app"} 1\n' in text
+    assert text.endswith("# EOF\n")
+
+
+def test_metrics_concurrent_writes(tmp_path):
+    metrics_file = os.path.join(tmp_path, "app.prom")
+    registry = MetricsRegistry()
+    registry.counter("items").inc()
+
+    errors = []
+
+    def write():
+        try:
+            for _ in range(50):
+                registry.write(metrics_file)
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert os.listdir(tmp_path) == ["app.prom"]
+    assert os.stat(metrics_file).st_mode & 0o777 == 0o644
+
+
+def test_metrics_gauge_and_types():
+    registry = MetricsRegistry()
+    gauge = registry.gauge("queue")
+    gauge.inc(3)
+    gauge.dec()
+    assert gauge.value == 2
+    with pytest.raises(ValueError, match="Metric queue is already defined as a gauge"):
+        registry.counter("queue")
+
+
+def test_metrics_write_failure(tmp_path):
+    metrics_file = os.path.join(tmp_path, "app.prom")
+    registry = MetricsRegistry()
+    with mock.patch("os.replace", side_effect=OSError("disk full")):
+        with pytest.raises(OSError, match="disk full"):
+            registry.write(metrics_file)
+    assert os.listdir(tmp_path) == []
+
+
+def test_metrics_writer_interval(tmp_path):
+    metrics_file = os.path.join(tmp_path, "app.prom")
+    registry = MetricsRegistry()
+    registry.counter("items").inc()
+    with MetricsWriter(registry, metrics_file, interval=0.01):
+        deadline = time.monotonic() + 5
+        # written periodically, before stopping
+        while not os.path.exists(metrics_file) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert os.path.exists(metrics_file)
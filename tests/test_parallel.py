@@ -0,0 +1,108 @@
+import os
+
+import mock
+import pytest
+
+from deric import Command, arg
+from deric.parallel import ParallelMapError, parallel_map
+
+
+def scale(config, item):
+    if item < 0:
+        raise ValueError(f"negative item {item}")
+    return item * config.factor
+
+
+class ParallelApp(Command):
+    name = "parallel_app"
+    description = "Scale items in parallel"
+
+    Config = {
+        "factor": arg(int, 2, "factor to multiply by"),
+    }
+
+    def run(self, config):
+        return list(self.parallel_map(scale, range(50)))
+
+
+class ParallelChild(Command):
+    name = "parallel_child"
+    description = "Scale items in parallel, as a subcommand"
+
+    Config = {
+        "factor": arg(int, 5, "factor to multiply by"),
+    }
+
+    def run(self, config):
+        with mock.patch("deric.parallel_map", wraps=parallel_map) as wrapped:
+            results = list(self.parallel_map(scale, range(10)))
+        assert wrapped.call_args.kwargs["workers"] == config.parallel_child.workers
+        return results
+
+
+class ParallelParent(Command):
+    name = "parallel_parent"
+    description = "Run the parallel subcommand"
+
+    subcommands = [ParallelChild._with_workers(workers=3)]
+
+    Config = {
+        "factor": arg(int, 2, "factor to multiply by"),
+    }
+
+    def run(self, config):
+        pass
+
+
+def test_parallel_map_command():
+    app = ParallelApp._with_workers(workers=2)
+    assert app is not ParallelApp
+    assert "workers" not in ParallelApp._fields()
+    invocation = app.invoke(["--factor", "3", "--chunk-size", "4"])
+    assert invocation.config.workers == 2
+    assert invocation.config.chunk_size == 4
+    assert invocation.results == [[3 * i for i in range(50)]]
+
+
+def test_parallel_map_subcommand():
+    invocation = ParallelParent.invoke(["parallel_child"])
+    assert invocation.config.parallel_child.workers == 3
+    # the function gets the main command config
+    assert invocation.results[1] == [2 * i for i in range(10)]
+
+
+def test_parallel_map_unordered_and_stats():
+    config = ParallelApp.invoke([]).config
+    stats = {}
+    results = parallel_map(scale, iter(range(200)), config, workers=2, ordered=False, stats=stats)
+    assert sorted(results) == [2 * i for i in range(200)]
+    assert os.getpid() not in stats
+    assert sum(worker.items for worker in stats.values()) == 200
+    assert all(worker.errors == 0 for worker in stats.values())
+
+
+def test_parallel_map_errors():
+    config = ParallelApp.invoke([]).config
+    results = []
+    with pytest.raises(ParallelMapError) as exc_info:
+        for result in parallel_map(scale, [1, -1, 2, -2, 3], config, workers=2):
+            results.append(result)
+    assert results == [2, 4, 6]
+    assert [i for i, _ in exc_info.value.errors] == [1, 3]
+    assert isinstance(exc_info.value.errors[0][1], ValueError)
+
+
+def test_parallel_map_chunks_and_early_stop():
+    config = ParallelApp.invoke([]).config
+    stats = {}
+    # fast items get larger chunks
+    assert list(parallel_map(scale, range(2000), config, workers=2, stats=stats)) == [
+        2 * i for i in range(2000)
+    ]
+    assert sum(worker.chunks for worker in stats.values()) < 2000
+    assert repr(next(iter(stats.values()))).startswith("WorkerStats(items=")
+
+    results = parallel_map(scale, range(1000), config, workers=2, chunk_size=1)
+    assert next(results) == 0
+    # pending chunks are cancelled
+    results.close()
@@ -0,0 +1,63 @@
+import io
+import logging
+
+import mock
+from rich.console import Console
+
+from deric import Command
+from deric.progress import Progress
+
+
+class ProgressApp(Command):
+    name = "progress_app"
+    description = "Count items"
+
+    def run(self, config):
+        with self.progress("items", total=1000) as progress:
+            for _ in progress.track(range(1000)):
+                pass
+        print(progress.completed)
+
+
+def test_progress_plain(capsys, caplog):
+    caplog.set_level(logging.INFO)
+    with mock.patch("sys.argv", ["main.py"]):
+        ProgressApp().start()
+    assert capsys.readouterr().out == "1000\n"
+    assert "items: 1000/1000 (100.0%) in" in caplog.text
+
+
+def test_progress_plain_interval(caplog):
+    caplog.set_level(logging.INFO)
+    with Progress("unbounded", log_interval=0.01, plain=True) as progress:
+        progress.advance(5)
+        progress._stop.wait(0.05)
+    assert "unbounded: 5 in" in caplog.text
+    assert len(caplog.records) > 1
+
+
+def test_progress_rich():
+    file = io.StringIO()
+    console = Console(file=file, force_terminal=True, width=80)
+    with mock.patch("deric.logs.console", console):
+        with Progress("items", total=10, refresh_per_second=100, plain=False) as progress:
+            progress.advance(5)
+            # refreshed while running
+            progress._stop.wait(0.05)
+            progress.advance(5)
+    assert "items" in file.getvalue()
+
+
+class PlainProgressApp(Command):
+    name = "plain_progress_app"
+    description = "Check the progress mode"
+
+    def run(self, config):
+        return self.progress("items").plain
+
+
+def test_progress_log_plain():
+    app = PlainProgressApp._with_log_file()
+    with mock.patch("deric.logs.is_interactive", return_value=True):
+        assert app.invoke([]).results == [False]
+        assert app.invoke(["--log-plain"]).results == [True]
@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+
+import mock
+import pytest
+
+from deric import Command, arg, stage
+from deric.stages import run_stages, topological_order
+
+
+class Ingest(Command):
+    name = "ingest"
+    description = "Ingest from two sources"
+
+    Config = {
+        "suffix": arg(str, "!", "suffix of merged data"),
+    }
+
+    @stage()
+    def fetch_a(self, config):
+        time.sleep(0.05)
+        return threading.get_ident(), "a"
+
+    @stage()
+    def fetch_b(self, config):
+        time.sleep(0.05)
+        return threading.get_ident(), "b"
+
+    @stage("fetch_a", "fetch_b")
+    def merge(self, config, fetch_a, fetch_b):
+        return fetch_a[1] + fetch_b[1] + config.suffix
+
+
+def test_stages(caplog):
+    caplog.set_level(logging.INFO)
+    with mock.patch("sys.argv", ["main.py", "--suffix", "?"]):
+        app = Ingest()
+    results = app.run(app.config)
+    assert results["merge"] == "ab?"
+    # independent stages ran concurrently
+    assert results["fetch_a"][0] != results["fetch_b"][0]
+    assert "Stage merge of ingest done in" in caplog.text
+
+
+def test_stages_fail_fast():
+    ran = []
+
+    class Failing(Command):
+        name = "failing"
+        description = "Fail in a stage"
+
+        @stage()
+        def broken(self, config):
+            raise RuntimeError("broken")
+
+        @stage("broken")
+        def after_broken(self, config, broken):
+            ran.append("after_broken")
+
+        def run(self, config):
+            return self.run_stages(config)
+
+    with mock.patch("sys.argv", ["main.py"]):
+        with pytest.raises(RuntimeError, match="broken"):
+            Failing().start()
+    assert ran == []
+
+
+def test_stages_invalid():
+    with pytest.raises(ValueError, match="unknown stage"):
+
+        class Unknown(Command):
+            name = "unknown"
+            description = ""
+
+            @stage("missing")
+            def first(self, config):
+                pass
+
+    with pytest.raises(ValueError, match="circular"):
+
+        class Circular(Command):
+            name = "circular"
+            description = ""
+
+            @stage("second")
+            def first(self, config):
+                pass
+
+            @stage("first")
+            def second(self, config):
+                pass
+
+    assert topological_order({"c": ("a", "b"), "b": ("a",), "a": ()}) == ["a", "b", "c"]
+
+    with pytest.raises(ValueError, match="Unknown stage executor fiber"):
+        run_stages(Ingest, None, Ingest._stages, executor="fiber")
+
+
+class ProcessIngest(Ingest):
+    name = "process_ingest"
+    stage_executor = "process"
+    max_stage_workers = 2
+
+
+def test_stages_process():
+    with mock.patch("sys.argv", ["main.py"]):
+        app = ProcessIngest()
+    assert app.run(app.config)["merge"] == "ab!"
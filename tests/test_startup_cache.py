@@ -0,0 +1,144 @@
+import os
+import subprocess
+import sys
+import threading
+
+import mock
+import pytest
+
+from deric import Command, arg
+from deric.startup_cache import (
+    dumps_parser,
+    entry_name,
+    fingerprint_commands,
+    load_parser,
+    loads_parser,
+    store_parser,
+)
+from tests.test_subcommands import NestedApp
+
+
+def test_startup_cache_pickle_roundtrip():
+    parser = NestedApp._populate_subcommands()
+    loaded = loads_parser(dumps_parser(parser))
+    assert loaded.format_help() == parser.format_help()
+    for argv in (
+        ["--string", "abc", "greet"],
+        ["--string", "abc", "nested", "subsub", "--nested-arg", "ok"],
+    ):
+        assert loaded.parse_args(argv) == parser.parse_args(argv)
+
+
+def test_startup_cache(tmp_path):
+    env = {"XDG_CACHE_HOME": str(tmp_path)}
+    path = os.path.join(tmp_path, "deric", "startup", f"{entry_name(NestedApp)}.pickle")
+
+    with mock.patch.object(NestedApp, "startup_cache", new=True):
+        # cold start
+        NestedApp._parser_cache = None
+        parser, _ = NestedApp._parser(env)
+        assert os.path.exists(path)
+
+        # warm start, commands definitions are not used
+        NestedApp._parser_cache = None
+        with mock.patch.object(NestedApp, "_populate_subcommands") as populate:
+            warm, _ = NestedApp._parser(env)
+        populate.assert_not_called()
+        assert warm.format_help() == parser.format_help()
+
+        # changed commands replace the entry
+        NestedApp._parser_cache = None
+        with mock.patch("deric.fingerprint_commands", return_value="changed"):
+            NestedApp._parser(env)
+        assert os.listdir(os.path.dirname(path)) == [os.path.basename(path)]
+        assert load_parser(os.path.dirname(path), entry_name(NestedApp), "changed")
+        assert not load_parser(os.path.dirname(path), entry_name(NestedApp), "stale")
+    NestedApp._parser_cache = None
+
+
+class SetApp(Command):
+    name = "set_app"
+    description = "Command with a set default"
+
+    Config = {
+        "names": arg(set[str], {"a", "b", "c", "d", "e"}, "names"),
+    }
+
+    def run(self, config):
+        pass
+
+
+def test_startup_cache_fingerprint_hash_seed():
+    # set defaults don't make the key depend on string hashing
+    code = (
+        "from deric.startup_cache import fingerprint_commands\n"
+        "from tests.test_startup_cache import SetApp\n"
+        "print(fingerprint_commands(SetApp))\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    keys = {
+        subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=root,
+            env={**os.environ, "PYTHONHASHSEED": str(seed)},
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        for seed in range(4)
+    }
+    assert keys == {fingerprint_commands(SetApp) + "\n"}
+
+
+def test_startup_cache_concurrent_stores(tmp_path):
+    parser = NestedApp._populate_subcommands()
+    errors = []
+
+    def store():
+        try:
+            for _ in range(20):
+                store_parser(str(tmp_path), "entry", "key", parser)
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=store) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert os.listdir(tmp_path) == ["entry.pickle"]
+    assert load_parser(str(tmp_path), "entry", "key").format_help() == parser.format_help()
+
+
+def test_startup_cache_failures(tmp_path):
+    import argparse
+
+    # invalid entries are ignored
+    with open(os.path.join(tmp_path, "invalid.pickle"), "wb") as file:
+        file.write(b"not a pickle")
+    assert load_parser(str(tmp_path), "invalid", "key") is None
+    assert load_parser(str(tmp_path), "missing", "key") is None
+
+    # parsers that can't be pickled are not stored
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--value", type=lambda x: x)
+    store_parser(str(tmp_path), "unpicklable", "key", parser)
+    assert not os.path.exists(os.path.join(tmp_path, "unpicklable.pickle"))
+
+    # failed writes leave no temporary file
+    with mock.patch("os.replace", side_effect=OSError("disk full")):
+        with pytest.raises(OSError, match="disk full"):
+            store_parser(str(tmp_path), "entry", "key", NestedApp._populate_subcommands())
+    assert os.listdir(tmp_path) == ["invalid.pickle"]
+
+    # commands that can't be fingerprinted build the parser every time
+    env = {"XDG_CACHE_HOME": str(tmp_path / "cache")}
+    with mock.patch.object(NestedApp, "startup_cache", new=True), mock.patch(
+        "deric.fingerprint_commands", side_effect=TypeError,
+    ):
+        NestedApp._parser_cache = None
+        parser, _ = NestedApp._parser(env)
+    NestedApp._parser_cache = None
+    assert parser.format_help() == NestedApp._populate_subcommands().format_help()
+    assert not os.path.exists(env["XDG_CACHE_HOME"])
@@ -0,0 +1,195 @@
+import threading
+import time
+
+import pytest
+
+from deric import Command, arg
+from deric.streams import ThreadedStream, iter_async
+
+
+class Sum(Command):
+    name = "sum"
+    description = "Sum streamed values"
+
+    Config = {}
+
+    def run(self, config, values):
+        return sum(values)
+
+
+class Numbers(Command):
+    name = "numbers"
+    description = "Stream numbers"
+
+    subcommands = [Sum]
+
+    Config = {
+        "count": arg(int, 5, "how many numbers"),
+    }
+
+    def run(self, config):
+        for i in range(config.count):
+            yield i
+
+
+class ThreadedNumbers(Numbers):
+    name = "threaded_numbers"
+    stream_thread = True
+    stream_buffer_size = 2
+
+
+class AsyncNumbers(Numbers):
+    name = "async_numbers"
+
+    async def run(self, config):
+        for i in range(config.count):
+            yield i
+
+
+def test_stream_to_next_command():
+    assert Numbers.invoke(["--count", "4", "sum"]).results[1] == 6
+    assert ThreadedNumbers.invoke(["--count", "100", "sum"]).results[1] == 4950
+    assert AsyncNumbers.invoke(["--count", "4", "sum"]).results[1] == 6
+
+
+def test_threaded_stream_overlaps():
+    produced = []
+
+    def source():
+        for i in range(3):
+            produced.append(i)
+            yield i
+
+    stream = ThreadedStream(source(), maxsize=10)
+    deadline = time.monotonic() + 5
+    # items are produced before being requested
+    while len(produced) < 3 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert produced == [0, 1, 2]
+    assert list(stream) == [0, 1, 2]
+
+
+def test_threaded_stream_error():
+    def source():
+        yield 1
+        raise RuntimeError("broken source")
+
+    stream = ThreadedStream(source())
+    assert next(stream) == 1
+    with pytest.raises(RuntimeError, match="broken source"):
+        next(stream)
+    assert list(stream) == []
+
+
+def test_threaded_stream_close():
+    stopped = threading.Event()
+
+    def source():
+        try:
+            i = 0
+            while True:
+                yield i
+                i += 1
+        finally:
+            stopped.set()
+
+    stream = ThreadedStream(source(), maxsize=1)
+    assert next(stream) == 0
+    # the producer waits for room in the buffer
+    time.sleep(0.2)
+    stream.close()
+    assert stopped.wait(5)
+
+
+def test_iter_async():
+    async def source():
+        for i in range(3):
+            yield i
+
+    assert list(iter_async(source())) == [0, 1, 2]
+
+
+class First(Command):
+    name = "first"
+    description = "Take the first streamed value"
+
+    Config = {}
+
+    def run(self, config, values):
+        return next(values)
+
+
+class Doubled(Command):
+    name = "doubled"
+    description = "Double streamed values, streaming them"
+
+    subcommands = [Sum, First]
+
+    Config = {}
+
+    def run(self, config, values):
+        for value in values:
+            yield value * 2
+
+
+class SlowNumbers(Command):
+    name = "slow_numbers"
+    description = "Stream numbers slowly"
+
+    subcommands = [Sum, First, Doubled]
+
+    Config = {}
+    closed = threading.Event()
+
+    async def run(self, config):
+        try:
+            for i in range(4):
+                time.sleep(0.05)
+                yield i
+        finally:
+            self.closed.set()
+
+
+def run_seconds(command, name):
+    for line in command.metrics.render().splitlines():
+        if line.startswith(f'deric_command_run_seconds_sum{{command="{name}"}}'):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"no run time for {name}")
+
+
+def test_stream_producer_time(monkeypatch):
+    monkeypatch.setattr("sys.argv", ["main.py", "sum"])
+    app = SlowNumbers()
+    assert app.start()[1] == 6
+    # the producer is accounted for the time spent producing items
+    assert run_seconds(app, "slow_numbers") >= 0.2
+
+
+def test_stream_closed_early():
+    SlowNumbers.closed.clear()
+    assert SlowNumbers.invoke(["first"]).results[1] == 0
+    assert SlowNumbers.closed.is_set()
+
+
+def test_stream_chain():
+    # streams are consumed lazily through the chain
+    assert Numbers.invoke(["--count", "4", "sum"]).results[1] == 6
+    assert SlowNumbers.invoke(["doubled", "sum"]).results[2] == 12
+    SlowNumbers.closed.clear()
+    assert SlowNumbers.invoke(["doubled", "first"]).results[2] == 0
+    assert SlowNumbers.closed.is_set()
+
+
+class ThreadedSlowNumbers(SlowNumbers):
+    name = "threaded_slow_numbers"
+    stream_thread = True
+    stream_buffer_size = 1
+    closed = threading.Event()
+
+
+def test_threaded_stream_closed_before_return(monkeypatch):
+    monkeypatch.setattr("sys.argv", ["main.py", "first"])
+    assert ThreadedSlowNumbers().start()[1] == 0
+    # the producer is done, its source closed, when start returns
+    assert ThreadedSlowNumbers.closed.is_set()
+    assert not any(t.name == "stream-producer" for t in threading.enumerate())
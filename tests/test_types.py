@@ -42,3 +42,116 @@ def test_enum_by_name_missing():
     with mock.patch("sys.argv", args):
         with pytest.raises(ValidationError):
             SimpleApp().start()
+
+
+class CaseInsensitiveEnum(EnumByName, case_insensitive=True):
+    Red = 1
+    blue = 2
+
+
+def test_enum_by_name_list():
+    from pydantic import TypeAdapter
+
+    adapter = TypeAdapter(list[ExampleEnum])
+    assert adapter.validate_python(["a", "b", ExampleEnum.a]) == [
+        ExampleEnum.a,
+        ExampleEnum.b,
+        ExampleEnum.a,
+    ]
+    assert adapter.dump_json([ExampleEnum.b]) == b'["b"]'
+    with pytest.raises(ValidationError, match="'c' not found for enum ExampleEnum. Expected one of: \\['a', 'b'\\]"):
+        adapter.validate_python(["a", "c"])
+    with pytest.raises(ValidationError, match="3 not found for enum ExampleEnum"):
+        adapter.validate_python([3])
+
+
+def test_enum_by_name_case_insensitive():
+    from pydantic import TypeAdapter
+
+    adapter = TypeAdapter(CaseInsensitiveEnum)
+    assert adapter.validate_python("RED") is CaseInsensitiveEnum.Red
+    assert adapter.validate_python("Blue") is CaseInsensitiveEnum.blue
+
+    # case sensitive by default
+    with pytest.raises(ValidationError):
+        TypeAdapter(ExampleEnum).validate_python("A")
+
+    assert adapter.json_schema() == {"enum": ["Red", "blue"], "title": "CaseInsensitiveEnum"}
+
+    class Ambiguous(EnumByName, case_insensitive=True):
+        red = 1
+        RED = 2
+
+    with pytest.raises(TypeError, match="Names of Ambiguous are not unique ignoring case"):
+        TypeAdapter(Ambiguous)
+
+
+def test_packed_lists(tmp_path):
+    from array import array
+
+    from deric.types import PackedFloatList, PackedIntList
+
+    config_file = tmp_path / "config.toml"
+    config_file.write_text("weights = [0.5, 1, 2.25]\n")
+
+    class PackedApp(Command):
+        name = "packed_app"
+        description = "Sum packed lists"
+
+        Config = {
+            "ids": arg(PackedIntList, PackedIntList(), "ids"),
+            "weights": arg(PackedFloatList, ..., "weights"),
+            "config_file": arg(str, "", "config file path"),
+        }
+
+        def run(self, config):
+            return sum(config.ids), sum(config.weights)
+
+    invocation = PackedApp.invoke(["--ids", "1, 2,3", "--config-file", str(config_file)])
+    assert invocation.results == [(6, 3.75)]
+    config = invocation.config
+    assert isinstance(config.ids, PackedIntList)
+    assert isinstance(config.ids, array) and config.ids.typecode == "q"
+    assert isinstance(config.weights, PackedFloatList) and config.weights.typecode == "d"
+    # no copies after validation
+    assert config.to_dict()["ids"] is config.ids
+
+
+def test_packed_lists_validation():
+    from pydantic import TypeAdapter
+
+    from deric.types import PackedIntList
+
+    adapter = TypeAdapter(PackedIntList)
+    packed = PackedIntList(range(5))
+    assert adapter.validate_python(packed) is packed
+    assert adapter.validate_python(["1", 2]) == PackedIntList([1, 2])
+    assert adapter.validate_python(x for x in range(3)) == PackedIntList([0, 1, 2])
+    assert adapter.dump_json(packed) == b"[0,1,2,3,4]"
+    for invalid in ("1,a", [1.5], 7, [2**70]):
+        with pytest.raises(ValidationError):
+            adapter.validate_python(invalid)
+
+
+def test_packed_lists_copies():
+    import copy
+    import pickle
+
+    from pydantic import TypeAdapter
+
+    from deric.types import PackedFloatList
+
+    packed = PackedFloatList([0.5, 2])
+    assert repr(packed) == "PackedFloatList([0.5, 2.0])"
+    pickled = [
+        pickle.loads(pickle.dumps(packed, protocol))
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1)
+    ]
+    for copied in (copy.copy(packed), copy.deepcopy(packed), *pickled):
+        assert type(copied) is PackedFloatList
+        assert copied == packed and copied is not packed
+    assert TypeAdapter(PackedFloatList).json_schema() == {
+        "type": "array",
+        "items": {"type": "number"},
+        "title": "PackedFloatList",
+    }
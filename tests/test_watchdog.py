@@ -0,0 +1,93 @@
+import logging
+import os
+import time
+
+import mock
+
+from deric import Command, arg
+from deric.watchdog import Watchdog
+
+
+def busy_loop(seconds):
+    end = time.monotonic() + seconds
+    while time.monotonic() < end:
+        pass
+
+
+def test_watchdog(tmp_path, caplog):
+    log_file = os.path.join(tmp_path, "run.log")
+
+    class SlowApp(Command):
+        name = "slow_app"
+        description = "Take some time"
+        watchdog_interval = 0.005
+
+        Config = {
+            "log_file": arg(str, "", "log file"),
+            "watchdog_threshold": arg(float, 0.05, "watchdog threshold"),
+        }
+
+        def run(self, config):
+            busy_loop(0.3)
+
+    with mock.patch("sys.argv", ["main.py", "--log-file", log_file]):
+        SlowApp().start()
+
+    with open(os.path.join(tmp_path, "run.slow_app.stacks")) as file:
+        lines = file.read().splitlines()
+    assert lines
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) > 0
+    assert "busy_loop (test_watchdog.py:" in stack
+    assert "slow_app done, hottest frames over" in caplog.text
+
+
+def test_watchdog_below_threshold(caplog):
+    with Watchdog("fast", 10) as watchdog:
+        pass
+    assert watchdog.samples == 0
+    assert caplog.text == ""
+
+
+def test_watchdog_periodic_report(caplog):
+    caplog.set_level(logging.WARNING)
+    with Watchdog("periodic", 0, interval=0.005, report_interval=0.02) as watchdog:
+        busy_loop(0.1)
+    assert watchdog.samples > 0
+    assert "periodic still running" in caplog.text
+    assert "busy_loop" in watchdog.hottest()[0][0]
+
+
+def test_watchdog_skips_idle_threads():
+    import threading
+
+    stop = threading.Event()
+    idle = [threading.Thread(target=stop.wait) for _ in range(3)]
+    for thread in idle:
+        thread.start()
+    try:
+        with Watchdog("idle", 0, interval=0.005, report_interval=60) as watchdog:
+            busy_loop(0.1)
+    finally:
+        stop.set()
+        for thread in idle:
+            thread.join()
+    assert watchdog.samples > 0
+    assert "busy_loop" in watchdog.hottest()[0][0]
+    assert not any("threading.py" in stack.rsplit(";", 1)[-1] for stack in watchdog.stacks)
+
+
+def test_watchdog_report_errors(tmp_path, caplog):
+    caplog.set_level(logging.WARNING)
+    output = os.path.join(tmp_path, "missing", "run.stacks")
+    with Watchdog("unwritable", 0, output=output, interval=0.005, report_interval=0.02):
+        busy_loop(0.1)
+    # sampling goes on after a failed write, up to the final report
+    assert "Can't write stacks of unwritable to" in caplog.text
+    assert "unwritable done, hottest frames over" in caplog.text
+    assert "(stacks in" not in caplog.text
+
+    output = os.path.join(tmp_path, "run.stacks")
+    with Watchdog("written", 0, output=output, interval=0.005, report_interval=0.02):
+        busy_loop(0.1)
+    assert os.listdir(tmp_path) == ["run.stacks"]